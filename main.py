@@ -1,3 +1,6 @@
+import argparse
+import os
+
 import uvicorn
 from fastapi import FastAPI, status
 from fastapi.responses import JSONResponse
@@ -5,12 +8,20 @@ from fastapi_pagination import add_pagination
 from starlette.middleware.cors import CORSMiddleware
 from uvicorn.config import LOGGING_CONFIG
 
+from src.errors.NotFoundError import NotFoundError
 from src.errors.UserError import UserError
 from src.jsonapi.json_api import JSONAPIError, JSONAPIErrorResponse
+from src.notifications.relay import DEFAULT_RELAY_SOCKET, start_relay
+from src.routers.analytics_router import router as analytics_router
 from src.routers.bill_router import router as bill_router
 from src.routers.expenses_router import router as expenses_router
+from src.routers.export_router import router as export_router
+from src.routers.forecast_router import router as forecast_router
+from src.routers.import_router import router as import_router
 from src.routers.income_router import router as income_router
+from src.routers.metrics_router import router as metrics_router
 from src.routers.months_router import router as months_router
+from src.settings.settings import app_settings
 
 origins = [
     "*"
@@ -28,6 +39,11 @@ app.include_router(expenses_router)
 app.include_router(months_router)
 app.include_router(bill_router)
 app.include_router(income_router)
+app.include_router(import_router)
+app.include_router(export_router)
+app.include_router(analytics_router)
+app.include_router(forecast_router)
+app.include_router(metrics_router)
 
 
 @app.get("/")
@@ -56,8 +72,36 @@ async def user_error_handler(request, exc):
     )
 
 
+@app.exception_handler(NotFoundError)
+async def not_found_error_handler(request, exc):
+    return JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND,
+        content=JSONAPIErrorResponse(errors=[
+            JSONAPIError(
+                status=str(status.HTTP_404_NOT_FOUND),
+                title="Not Found",
+                detail=exc.message,
+                code=exc.code
+            )
+        ])
+        .model_dump(mode='json', exclude_none=True),
+    )
+
+
 add_pagination(app)
 
 if (__name__ == '__main__'):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes, notifications reach them through one relay process')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
     LOGGING_CONFIG["formatters"]["default"]["fmt"] = "%(asctime)s [%(name)s] %(levelprefix)s %(message)s"
-    uvicorn.run(app, host='0.0.0.0')
+    if (args.workers > 1):
+        relay_socket = app_settings.notify_relay_socket or DEFAULT_RELAY_SOCKET
+        start_relay(relay_socket)
+        # Read by the settings of the workers
+        os.environ['NOTIFY_RELAY_SOCKET'] = relay_socket
+        uvicorn.run('main:app', host='0.0.0.0', port=args.port, workers=args.workers)
+    else:
+        uvicorn.run(app, host='0.0.0.0', port=args.port)
@@ -0,0 +1,51 @@
+-- Opt-in row payloads: with `ALTER DATABASE <db> SET financer.notify_rows = 'on'` inserts and updates
+-- notify 'row <json>' instead of 'add <id>', so listeners don't have to query the row back.
+-- Rows that don't fit in a NOTIFY payload (8000 bytes) still notify 'add <id>'.
+CREATE OR REPLACE FUNCTION notify_payload(id uuid, row_data json)
+    RETURNS TEXT
+    LANGUAGE PLPGSQL
+    STABLE
+AS
+$$
+DECLARE
+    payload TEXT;
+BEGIN
+    IF coalesce(current_setting('financer.notify_rows', true), 'off') = 'on' then
+        payload := concat_ws(' ', 'row', row_data::text);
+        IF octet_length(payload) < 8000 then
+            RETURN payload;
+        end if;
+    end if;
+    RETURN concat_ws(' ', 'add', id);
+END
+$$;
+
+CREATE OR REPLACE FUNCTION notify_update_or_insert_expense()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+AS
+$$
+BEGIN
+    IF NEW.id is null then
+        PERFORM pg_notify('expenses', concat_ws(' ', 'del', OLD.id)) ;
+    ELSE
+        PERFORM pg_notify('expenses', notify_payload(NEW.id, row_to_json(NEW))) ;
+    end if;
+    RETURN NEW;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION notify_update_or_insert_bill()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+AS
+$$
+BEGIN
+    IF NEW.id is null then
+        PERFORM pg_notify(concat_ws('_', 'bill', OLD.month_id), concat_ws(' ', 'del', OLD.id));
+    ELSE
+        PERFORM pg_notify(concat_ws('_', 'bill', NEW.month_id), notify_payload(NEW.id, row_to_json(NEW)));
+    end if;
+    RETURN NEW;
+END
+$$;
@@ -0,0 +1,155 @@
+CREATE INDEX ix_bills_month_id ON bills USING BTREE (month_id);
+CREATE INDEX ix_income_month_id ON income USING BTREE (month_id);
+
+-- Totals of each month, kept up to date by the triggers below instead of aggregating every bill and income
+CREATE TABLE public.month_summary (
+  slug VARCHAR PRIMARY KEY NOT NULL,
+  id uuid NOT NULL,
+  year INTEGER NOT NULL,
+  month INTEGER NOT NULL,
+  total_income NUMERIC,
+  total_expense NUMERIC,
+  balance NUMERIC,
+  first_date INTEGER,
+  last_date INTEGER,
+  paid BOOLEAN
+);
+CREATE INDEX ix_month_summary_year ON month_summary USING BTREE (year);
+
+CREATE OR REPLACE FUNCTION refresh_month_summary(month_slug VARCHAR)
+    RETURNS VOID
+    LANGUAGE PLPGSQL
+AS
+$$
+BEGIN
+    UPDATE month_summary
+    SET total_income  = inc.total_income,
+        total_expense = exp.total_expense,
+        balance       = inc.total_income - exp.total_expense,
+        first_date    = exp.first_date,
+        last_date     = exp.last_date,
+        paid          = exp.paid
+    FROM (SELECT SUM(amount) total_income
+          FROM income
+          WHERE month_id = month_slug) inc,
+         (SELECT SUM(amount)   total_expense,
+                 BOOL_AND(paid) as paid,
+                 MIN(day)       as first_date,
+                 MAX(day)       as last_date
+          FROM bills
+          WHERE month_id = month_slug) exp
+    WHERE slug = month_slug;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION maintain_month_summary()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+AS
+$$
+BEGIN
+    IF TG_OP = 'DELETE' then
+        DELETE FROM month_summary WHERE slug = OLD.slug;
+        RETURN OLD;
+    end if;
+    IF TG_OP = 'UPDATE' then
+        DELETE FROM month_summary WHERE slug = OLD.slug;
+    end if;
+    INSERT INTO month_summary (slug, id, year, month) VALUES (NEW.slug, NEW.id, NEW.year, NEW.month);
+    PERFORM refresh_month_summary(NEW.slug);
+    RETURN NEW;
+END
+$$;
+
+CREATE OR REPLACE TRIGGER maintain_month_summary
+    AFTER INSERT OR UPDATE OR DELETE
+    ON months
+    FOR EACH ROW
+execute FUNCTION maintain_month_summary();
+
+-- Statement level, so a statement touching many rows of a month refreshes its summary once
+CREATE OR REPLACE FUNCTION refresh_month_summary_for_rows()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+AS
+$$
+DECLARE
+    month_slug VARCHAR;
+BEGIN
+    IF TG_OP = 'INSERT' then
+        FOR month_slug IN SELECT DISTINCT month_id FROM new_rows
+            LOOP
+                PERFORM refresh_month_summary(month_slug);
+            END LOOP;
+    ELSIF TG_OP = 'UPDATE' then
+        FOR month_slug IN SELECT month_id FROM new_rows UNION SELECT month_id FROM old_rows
+            LOOP
+                PERFORM refresh_month_summary(month_slug);
+            END LOOP;
+    ELSE
+        FOR month_slug IN SELECT DISTINCT month_id FROM old_rows
+            LOOP
+                PERFORM refresh_month_summary(month_slug);
+            END LOOP;
+    end if;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE TRIGGER refresh_month_summary_bill_insert
+    AFTER INSERT
+    ON bills
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+execute FUNCTION refresh_month_summary_for_rows();
+
+CREATE OR REPLACE TRIGGER refresh_month_summary_bill_update
+    AFTER UPDATE
+    ON bills
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+execute FUNCTION refresh_month_summary_for_rows();
+
+CREATE OR REPLACE TRIGGER refresh_month_summary_bill_delete
+    AFTER DELETE
+    ON bills
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+execute FUNCTION refresh_month_summary_for_rows();
+
+CREATE OR REPLACE TRIGGER refresh_month_summary_income_insert
+    AFTER INSERT
+    ON income
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+execute FUNCTION refresh_month_summary_for_rows();
+
+CREATE OR REPLACE TRIGGER refresh_month_summary_income_update
+    AFTER UPDATE
+    ON income
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+execute FUNCTION refresh_month_summary_for_rows();
+
+CREATE OR REPLACE TRIGGER refresh_month_summary_income_delete
+    AFTER DELETE
+    ON income
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+execute FUNCTION refresh_month_summary_for_rows();
+
+-- Income changes the month totals as well
+CREATE OR REPLACE TRIGGER notify_month_update_for_income
+    AFTER INSERT OR UPDATE OR DELETE
+    ON income
+    FOR EACH ROW
+execute FUNCTION notify_month_update_after_bill_update();
+
+-- Backfill from the aggregating view, which is then kept only as a compatibility alias of the table
+INSERT INTO month_summary (slug, id, year, month, total_income, total_expense, balance, first_date, last_date, paid)
+SELECT slug, id, year, month, total_income, total_expense, balance, first_date, last_date, paid
+FROM v_month_details;
+
+CREATE OR REPLACE VIEW v_month_details AS
+SELECT id, year, month, slug, total_income, total_expense, balance, first_date, last_date, paid
+FROM month_summary;
@@ -0,0 +1,11 @@
+-- Composite indexes matching the (sort key, id) page order, used by keyset (cursor) pagination
+CREATE INDEX ix_bills_day_id ON bills USING BTREE (day, id);
+CREATE INDEX ix_bills_month_id_day_id ON bills USING BTREE (month_id, day, id);
+CREATE INDEX ix_income_amount_id ON income USING BTREE (amount, id);
+CREATE INDEX ix_income_month_id_amount_id ON income USING BTREE (month_id, amount, id);
+CREATE INDEX ix_expenses_due_day_id ON expenses USING BTREE (due_day, id);
+
+-- Covered by the leading columns of the composite indexes, they would only add to the cost of every write
+DROP INDEX ix_bills_day;
+DROP INDEX ix_bills_month_id;
+DROP INDEX ix_income_month_id;
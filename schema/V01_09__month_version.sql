@@ -0,0 +1,31 @@
+-- Version of each month, bumped whenever its bills or income change. Used as the ETag of the month resources.
+-- Taken from a sequence so a month deleted and created again never repeats a version
+CREATE SEQUENCE month_summary_version;
+ALTER TABLE month_summary ADD COLUMN version BIGINT NOT NULL DEFAULT nextval('month_summary_version');
+
+CREATE OR REPLACE FUNCTION refresh_month_summary(month_slug VARCHAR)
+    RETURNS VOID
+    LANGUAGE PLPGSQL
+AS
+$$
+BEGIN
+    UPDATE month_summary
+    SET total_income  = inc.total_income,
+        total_expense = exp.total_expense,
+        balance       = inc.total_income - exp.total_expense,
+        first_date    = exp.first_date,
+        last_date     = exp.last_date,
+        paid          = exp.paid,
+        version       = nextval('month_summary_version')
+    FROM (SELECT SUM(amount) total_income
+          FROM income
+          WHERE month_id = month_slug) inc,
+         (SELECT SUM(amount)   total_expense,
+                 BOOL_AND(paid) as paid,
+                 MIN(day)       as first_date,
+                 MAX(day)       as last_date
+          FROM bills
+          WHERE month_id = month_slug) exp
+    WHERE slug = month_slug;
+END
+$$;
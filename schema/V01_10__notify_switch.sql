@@ -0,0 +1,84 @@
+-- Row notifications can be switched off for a transaction with `SET LOCAL financer.notify = 'off'`,
+-- bulk imports do so and notify each month they touched once instead.
+CREATE OR REPLACE FUNCTION notify_enabled()
+    RETURNS BOOLEAN
+    LANGUAGE PLPGSQL
+    STABLE
+AS
+$$
+BEGIN
+    RETURN coalesce(current_setting('financer.notify', true), '') <> 'off';
+END
+$$;
+
+CREATE OR REPLACE FUNCTION notify_update_or_insert_expense()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+AS
+$$
+BEGIN
+    IF NOT notify_enabled() then
+        RETURN NEW;
+    end if;
+    IF NEW.id is null then
+        PERFORM pg_notify('expenses', concat_ws(' ', 'del', OLD.id)) ;
+    ELSE
+        PERFORM pg_notify('expenses', notify_payload(NEW.id, row_to_json(NEW))) ;
+    end if;
+    RETURN NEW;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION notify_update_or_insert_month()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+AS
+$$
+BEGIN
+    IF NOT notify_enabled() then
+        RETURN NEW;
+    end if;
+    IF NEW.id is null then
+        PERFORM pg_notify('month', concat_ws(' ', 'del', OLD.slug)) ;
+    ELSE
+        PERFORM pg_notify('month', concat_ws(' ', 'add', NEW.slug)) ;
+    end if;
+    RETURN NEW;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION notify_update_or_insert_bill()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+AS
+$$
+BEGIN
+    IF NOT notify_enabled() then
+        RETURN NEW;
+    end if;
+    IF NEW.id is null then
+        PERFORM pg_notify(concat_ws('_', 'bill', OLD.month_id), concat_ws(' ', 'del', OLD.id));
+    ELSE
+        PERFORM pg_notify(concat_ws('_', 'bill', NEW.month_id), notify_payload(NEW.id, row_to_json(NEW)));
+    end if;
+    RETURN NEW;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION notify_month_update_after_bill_update()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+AS
+$$
+BEGIN
+    IF NOT notify_enabled() then
+        RETURN NEW;
+    end if;
+    IF NEW.id is null then
+        PERFORM pg_notify('month', concat_ws(' ', 'add', OLD.month_id)) ;
+    ELSE
+        PERFORM pg_notify('month', concat_ws(' ', 'add', NEW.month_id)) ;
+    end if;
+    RETURN NEW;
+END
+$$;
@@ -0,0 +1,15 @@
+-- Due date of a bill: its day in its month, the last day of the month when the day doesn't exist in it
+-- (or is not set)
+CREATE OR REPLACE FUNCTION bill_due_date(year integer, month integer, day integer)
+    RETURNS DATE
+    LANGUAGE PLPGSQL
+    IMMUTABLE
+AS
+$$
+DECLARE
+    first_day DATE := make_date(year, month, 1);
+    last_day  DATE := (first_day + interval '1 month')::DATE - 1;
+BEGIN
+    RETURN least(first_day + (coalesce(day, 31) - 1), last_day);
+END
+$$;
@@ -0,0 +1,58 @@
+-- Row payloads take the row itself, it is only serialized when financer.notify_rows is on, every other write
+-- skips the JSON encoding
+CREATE OR REPLACE FUNCTION notify_payload(id uuid, row_data anyelement)
+    RETURNS TEXT
+    LANGUAGE PLPGSQL
+    STABLE
+AS
+$$
+DECLARE
+    payload TEXT;
+BEGIN
+    IF coalesce(current_setting('financer.notify_rows', true), 'off') = 'on' then
+        payload := concat_ws(' ', 'row', row_to_json(row_data)::text);
+        IF octet_length(payload) < 8000 then
+            RETURN payload;
+        end if;
+    end if;
+    RETURN concat_ws(' ', 'add', id);
+END
+$$;
+
+CREATE OR REPLACE FUNCTION notify_update_or_insert_expense()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+AS
+$$
+BEGIN
+    IF NOT notify_enabled() then
+        RETURN NEW;
+    end if;
+    IF NEW.id is null then
+        PERFORM pg_notify('expenses', concat_ws(' ', 'del', OLD.id)) ;
+    ELSE
+        PERFORM pg_notify('expenses', notify_payload(NEW.id, NEW)) ;
+    end if;
+    RETURN NEW;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION notify_update_or_insert_bill()
+    RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+AS
+$$
+BEGIN
+    IF NOT notify_enabled() then
+        RETURN NEW;
+    end if;
+    IF NEW.id is null then
+        PERFORM pg_notify(concat_ws('_', 'bill', OLD.month_id), concat_ws(' ', 'del', OLD.id));
+    ELSE
+        PERFORM pg_notify(concat_ws('_', 'bill', NEW.month_id), notify_payload(NEW.id, NEW));
+    end if;
+    RETURN NEW;
+END
+$$;
+
+DROP FUNCTION notify_payload(uuid, json);
@@ -0,0 +1,30 @@
+-- The summary row is locked before the totals are aggregated. Aggregating in the UPDATE itself read the bills and
+-- income of its snapshot, so a transaction waiting on the row lock wrote totals missing the rows committed by the
+-- one holding it. Each statement of the function takes a new snapshot, the aggregates then see those rows.
+CREATE OR REPLACE FUNCTION refresh_month_summary(month_slug VARCHAR)
+    RETURNS VOID
+    LANGUAGE PLPGSQL
+AS
+$$
+BEGIN
+    PERFORM 1 FROM month_summary WHERE slug = month_slug FOR UPDATE;
+    UPDATE month_summary
+    SET total_income  = inc.total_income,
+        total_expense = exp.total_expense,
+        balance       = inc.total_income - exp.total_expense,
+        first_date    = exp.first_date,
+        last_date     = exp.last_date,
+        paid          = exp.paid,
+        version       = nextval('month_summary_version')
+    FROM (SELECT SUM(amount) total_income
+          FROM income
+          WHERE month_id = month_slug) inc,
+         (SELECT SUM(amount)   total_expense,
+                 BOOL_AND(paid) as paid,
+                 MIN(day)       as first_date,
+                 MAX(day)       as last_date
+          FROM bills
+          WHERE month_id = month_slug) exp
+    WHERE slug = month_slug;
+END
+$$;
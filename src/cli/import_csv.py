@@ -0,0 +1,39 @@
+"""
+Imports a CSV file of expenses, bills or income into the database
+
+    python -m src.cli.import_csv bills history.csv [--notify]
+"""
+import argparse
+import asyncio
+from typing import AsyncIterator
+
+from src.database.db import AsyncSessionLocal
+from src.errors.UserError import UserError
+from src.schemas.import_vo import ImportKind
+from src.services.import_service import ImportService, lines_of
+
+CHUNK_SIZE = 1 << 16
+
+
+async def _chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, 'rb') as file:
+        while (chunk := file.read(CHUNK_SIZE)):
+            yield chunk
+
+
+async def main(kind: ImportKind, path: str, notify: bool):
+    async with AsyncSessionLocal() as db:
+        result = await ImportService.import_csv(db, kind, lines_of(_chunks(path)), notify)
+    print(result.model_dump_json())
+
+
+if (__name__ == '__main__'):
+    parser = argparse.ArgumentParser(description="Imports a CSV file of expenses, bills or income")
+    parser.add_argument('kind', type=ImportKind, choices=list(ImportKind))
+    parser.add_argument('file')
+    parser.add_argument('--notify', action='store_true', help="send a notification for every imported row")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.kind, args.file, args.notify))
+    except UserError as e:
+        parser.exit(1, f"{e.message}\n")
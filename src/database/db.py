@@ -1,12 +1,23 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from src.database.pool import pool_options, track_pool_events
 from src.settings.settings import app_settings
 
 Base = declarative_base()
 
-engine = create_engine(app_settings.pg_connect_string)
+engine = create_engine(app_settings.pg_connect_string, **pool_options(QueuePool, 'sync'))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+track_pool_events(engine, 'sync')
+
+async_engine = create_async_engine(app_settings.pg_async_connect_string,
+                                   **pool_options(AsyncAdaptedQueuePool, 'async'))
+track_pool_events(async_engine.sync_engine, 'async')
+# Objects are not expired on commit, lazy loads are not possible on an AsyncSession
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
 
 
 # Dependency injection for the db, yields a session
@@ -18,5 +29,15 @@ async def get_db():
         db.close()
 
 
+# Dependency injection for the async db, yields a session bound to the async engine
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def fetch_connection():
     return SessionLocal()
+
+
+def fetch_async_connection():
+    return AsyncSessionLocal()
@@ -0,0 +1,98 @@
+import time
+
+from sqlalchemy import Engine, event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import Pool
+
+from src.settings.settings import app_settings
+
+POOL_METRICS = {}
+
+
+class PoolMetrics:
+    """
+    Checkout counters and wait times of one engine's pool
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.wait_count += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self, pool: Pool) -> dict:
+        return {
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': app_settings.pg_max_overflow,
+            'checkouts': self.checkouts,
+            'checkins': self.checkins,
+            'invalidations': self.invalidations,
+            'timeouts': self.timeouts,
+            'wait_avg_ms': (self.wait_total / self.wait_count * 1000) if self.wait_count else 0.0,
+            'wait_max_ms': self.wait_max * 1000,
+        }
+
+
+def metered_pool(pool_class: type[Pool], name: str) -> type[Pool]:
+    """
+    Subclass of pool_class timing how long each checkout waits for a connection. The metrics are bound to
+    the class, so they survive the pool being recreated on dispose.
+    """
+    metrics = POOL_METRICS.setdefault(name, PoolMetrics())
+
+    class MeteredPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except TimeoutError:
+                metrics.timeouts += 1
+                raise
+            finally:
+                metrics.record_wait(time.perf_counter() - start)
+
+    MeteredPool.__name__ = f'Metered{pool_class.__name__}'
+    return MeteredPool
+
+
+def pool_options(pool_class: type[Pool], name: str) -> dict:
+    """
+    Keyword arguments for create_engine / create_async_engine with the pool configured from the settings
+    """
+    return {
+        'poolclass': metered_pool(pool_class, name),
+        'pool_size': app_settings.pg_pool_size,
+        'max_overflow': app_settings.pg_max_overflow,
+        'pool_timeout': app_settings.pg_pool_timeout,
+        'pool_recycle': app_settings.pg_pool_recycle,
+        'pool_pre_ping': app_settings.pg_pool_pre_ping,
+    }
+
+
+def track_pool_events(engine: Engine, name: str):
+    """
+    Counts checkouts, checkins and invalidations from the pool events of the engine
+    """
+    metrics = POOL_METRICS.setdefault(name, PoolMetrics())
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts += 1
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        metrics.checkins += 1
+
+    @event.listens_for(engine, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
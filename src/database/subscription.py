@@ -1,50 +1,240 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from multiprocessing import Queue
+import json
+import socket
+from typing import Callable, Optional
 
-import nest_asyncio
 import psycopg2
+from psycopg2 import sql
 
 from src.settings.logging import logger
 from src.settings.settings import app_settings
 
-SUBSCRIPTIONS = {}
-ACTIVE_EXECUTORS = {}
+# Backoff between attempts to reconnect the listener
+RECONNECT_MIN_SECONDS = 0.5
+RECONNECT_MAX_SECONDS = 30
 
 
 class Subscription:
-    def __init__(self, channel: str, queue: Queue, is_active_callback):
+    def __init__(self, channel: str, callback: Callable[[str], None]):
         self.channel = channel
-        self.queue = queue
-        self.is_active = is_active_callback
+        self.callback = callback
 
     def unsubscribe(self):
-        subscriptions = SUBSCRIPTIONS.get(self.channel)
-        if (subscriptions):
-            subscriptions.remove(self)
-        if (not subscriptions):
-            executor = ACTIVE_EXECUTORS.get(self.channel)
-            executor.shutdown()
-            del ACTIVE_EXECUTORS[self.channel]
-            del SUBSCRIPTIONS[self.channel]
+        listener.remove(self)
+
+
+class NotificationListener:
+    """
+    Holds the single LISTEN connection of the process. The connection is polled from the main event loop,
+    channels are LISTENed while they have subscriptions and every notification is handed to the callbacks
+    subscribed to its channel. A lost connection is retried with backoff until it is back.
+    """
+    # Errors telling the connection is lost
+    connection_errors: tuple[type[Exception], ...] = (psycopg2.Error,)
+
+    def __init__(self):
+        self.connection = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.retry_handle: Optional[asyncio.TimerHandle] = None
+        self.retry_delay = RECONNECT_MIN_SECONDS
+        self.reader_fd: Optional[int] = None
+        self.subscriptions: dict[str, list[Subscription]] = {}
+        # Called with (channel, payload) for every notification, before the channel's subscriptions
+        self.taps: list[Callable[[str, str], None]] = []
+        # Called after reconnecting, notifications sent while disconnected are lost
+        self.reconnect_callbacks: list[Callable[[], None]] = []
+
+    def add(self, subscription: Subscription):
+        channel = subscription.channel
+        subscriptions = self.subscriptions.get(channel)
+        if (subscriptions is not None):
+            subscriptions.append(subscription)
+            logger.info(f"Already subscribed to {channel}")
+            return
+        self.subscriptions[channel] = [subscription]
+        self._execute('LISTEN', channel)
+        logger.info(f"Subscribed to {channel}")
+
+    def remove(self, subscription: Subscription):
+        channel = subscription.channel
+        subscriptions = self.subscriptions.get(channel)
+        if (subscriptions and subscription in subscriptions):
+            subscriptions.remove(subscription)
+        if (subscriptions is not None and not subscriptions):
+            del self.subscriptions[channel]
+            self._execute('UNLISTEN', channel)
+            logger.info(f"Unsubscribed from {channel}")
+
+    def close(self):
+        if (self.retry_handle is not None):
+            self.retry_handle.cancel()
+            self.retry_handle = None
+        self._disconnect()
+
+    def _disconnect(self):
+        if (self.connection is None):
+            return
+        # The descriptor the reader was added with, a broken connection no longer tells it
+        self.loop.remove_reader(self.reader_fd)
+        try:
+            self.connection.close()
+        except self.connection_errors:
+            pass
+        finally:
+            self.connection = None
+            self.loop = None
+
+    def _execute(self, verb: str, channel: str):
+        if (self.retry_handle is not None):
+            # The pending reconnect LISTENs to every subscribed channel
+            return
+        try:
+            self._ensure_connection()
+            self._listen(verb, channel)
+        except self.connection_errors:
+            logger.exception(f'Could not {verb} {channel}, reconnecting')
+            self._reconnect()
+
+    def _listen(self, verb: str, channel: str):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql.SQL(verb + ' {}').format(sql.Identifier(channel)))
+
+    def _ensure_connection(self):
+        if (self.connection is not None):
+            return
+        self.connection = self._connect()
+        self.loop = asyncio.get_running_loop()
+        self.reader_fd = self.connection.fileno()
+        self.loop.add_reader(self.reader_fd, self._handle_notify)
+        logger.info('Notification listener connected')
+
+    def _connect(self):
+        return _fetch_connection()
+
+    def _reconnect(self):
+        if (self.retry_handle is not None):
+            return
+        self._disconnect()
+        self._try_reconnect()
+
+    def _try_reconnect(self):
+        self.retry_handle = None
+        try:
+            self._ensure_connection()
+            for channel in self.subscriptions:
+                self._listen('LISTEN', channel)
+        except self.connection_errors:
+            logger.exception(f'Notification listener could not reconnect, retrying in {self.retry_delay}s')
+            self._disconnect()
+            self.retry_handle = asyncio.get_running_loop().call_later(self.retry_delay, self._try_reconnect)
+            self.retry_delay = min(self.retry_delay * 2, RECONNECT_MAX_SECONDS)
+            return
+        self.retry_delay = RECONNECT_MIN_SECONDS
+        for callback in self.reconnect_callbacks:
+            callback()
+
+    def _handle_notify(self):
+        try:
+            self.connection.poll()
+        except psycopg2.Error:
+            logger.exception('Notification connection lost, reconnecting')
+            self._reconnect()
+            return
+
+        notifies = self.connection.notifies
+        while notifies:
+            notify = notifies.pop(0)
+            logger.info(f"Received notification {notify.payload} on {notify.channel}")
+            self._dispatch(notify.channel, notify.payload)
+
+    def _dispatch(self, channel: str, payload: str):
+        callbacks = [lambda tap=tap: tap(channel, payload) for tap in self.taps]
+        callbacks += [lambda subscription=subscription: subscription.callback(payload)
+                      for subscription in self.subscriptions.get(channel, [])]
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception(f'Exception handling notification on {channel}')
+
+
+class RelayedNotificationListener(NotificationListener):
+    """
+    Listener of a worker process: channels are LISTENed by the notification relay of the host, which forwards
+    their notifications over its Unix socket, so the LISTEN connections don't grow with the workers.
+    """
+    connection_errors = (OSError,)
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.buffer = b''
+
+    def _listen(self, verb: str, channel: str):
+        self.connection.sendall(json.dumps((verb, channel)).encode() + b'\n')
+
+    def _connect(self):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(self.path)
+        except OSError:
+            connection.close()
+            raise
+        self.buffer = b''
+        return connection
+
+    def _handle_notify(self):
+        try:
+            data = self.connection.recv(1 << 16)
+        except OSError:
+            data = b''
+        if (not data):
+            logger.warning('Notification relay connection lost, reconnecting')
+            self._reconnect()
+            return
+
+        *lines, self.buffer = (self.buffer + data).split(b'\n')
+        for line in lines:
+            message = json.loads(line)
+            if (message[0] == 'NOTIFY'):
+                _, channel, payload = message
+                logger.info(f"Received notification {payload} on {channel}")
+                self._dispatch(channel, payload)
+            elif (message[0] == 'RECONNECT'):
+                # The relay lost its connection, notifications may have been lost
+                for callback in self.reconnect_callbacks:
+                    callback()
+
+
+if (app_settings.notify_relay_socket):
+    listener = RelayedNotificationListener(app_settings.notify_relay_socket)
+else:
+    listener = NotificationListener()
 
 
 class SubscriptionService:
 
     @staticmethod
-    def subscribe(channel: str, queue: Queue, is_active_callback) -> Subscription:
-        subscription = Subscription(channel, queue, is_active_callback)
-        if (channel in SUBSCRIPTIONS):
-            SUBSCRIPTIONS.get(channel, []).append(subscription)
-            logger.info(f"Already subscribed to {channel}")
-            return subscription
-        executor = ThreadPoolExecutor(max_workers=1)
-        SUBSCRIPTIONS[channel] = [subscription]
-        ACTIVE_EXECUTORS[channel] = executor
-        loop = asyncio.get_event_loop()
-        loop.run_in_executor(executor, _subscribe, channel)
+    def subscribe(channel: str, callback: Callable[[str], None]) -> Subscription:
+        subscription = Subscription(channel, callback)
+        listener.add(subscription)
         return subscription
 
+    @staticmethod
+    def tap(callback: Callable[[str, str], None], on_reconnect: Callable[[], None]):
+        """
+        Sees every notification received on any channel, and is told when notifications may have been lost
+        """
+        listener.taps.append(callback)
+        listener.reconnect_callbacks.append(on_reconnect)
+
+    @staticmethod
+    def on_reconnect(callback: Callable[[], None]):
+        """
+        Is told when notifications may have been lost
+        """
+        listener.reconnect_callbacks.append(callback)
+
 
 # Needed to use psycopg directly to be able to poll the events
 def _fetch_connection():
@@ -56,64 +246,3 @@ def _fetch_connection():
     )
     conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
     return conn
-
-
-def _subscribe(channel: str):
-    connection = _fetch_connection()
-    logger.info(f"Subscribing to {channel}")
-    cursor = connection.cursor()
-    cursor.execute(f"LISTEN {channel};")
-    cursor.close()
-    logger.info("Starting async loop")
-    nest_asyncio.apply()
-    loop = asyncio.new_event_loop()
-    try:
-        task = loop.create_task(_loop(connection, channel))
-        loop.run_until_complete(task)
-        logger.info(f'Subscription for {channel} finished')
-    except:
-        logger.exception('Exception in subscribe')
-    finally:
-        connection.close()
-
-
-async def _loop(connection, channel):
-    # while (active_callback()):
-    try:
-        loop = asyncio.get_event_loop()
-        loop.add_reader(connection, _handle_notify, connection, channel)
-        loop.run_until_complete(_has_subscriptions(channel=channel))
-        logger.info('Loop finished')
-        return True
-    except:
-        logger.exception('Loop finished with exception')
-
-
-def _handle_notify(connection, channel: str):
-    try:
-        connection.poll()
-        for notify in connection.notifies:
-            payload = notify.payload
-            logger.info(f"Received notification {payload}")
-            subscriptions = SUBSCRIPTIONS.get(channel)
-            for subscription in subscriptions:
-                is_active = subscription.is_active
-                if (is_active()):
-                    queue = subscription.queue
-                    queue.put(payload)
-                else:
-                    subscriptions.remove(subscription)
-        connection.notifies.clear()
-    except:
-        logger.exception('Exception in handle notify')
-
-
-async def _has_subscriptions(channel: str):
-    try:
-        while (SUBSCRIPTIONS.get(channel)):
-            await asyncio.sleep(1)
-
-        return False
-    except:
-        logger.exception('Exception in is completed')
-        return False
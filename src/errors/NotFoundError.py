@@ -0,0 +1,5 @@
+from src.errors.UserError import UserError
+
+
+class NotFoundError(UserError):
+    pass
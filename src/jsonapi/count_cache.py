@@ -0,0 +1,76 @@
+from collections import defaultdict
+from typing import Optional
+
+from src.database.subscription import Subscription, SubscriptionService
+from src.notifications.feed import parse_notification
+from src.settings.logging import logger
+
+# (table, scope) where scope is the month of a per-month list, or None for the whole table
+CountKey = tuple[str, Optional[str]]
+
+
+class CountCache:
+    """
+    Total counts of the list endpoints, per table and filter. Entries are dropped when the expenses or
+    month channels announce a change, and all of them when notifications may have been lost; a count
+    computed while a change was announced is not stored.
+    """
+
+    def __init__(self):
+        self.counts: dict[CountKey, int] = {}
+        self.generations = defaultdict(int)
+        self.subscriptions: list[Subscription] = []
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CountKey) -> Optional[int]:
+        self._ensure_subscribed()
+        count = self.counts.get(key)
+        if (count is None):
+            self.misses += 1
+        else:
+            self.hits += 1
+        return count
+
+    def generation(self, key: CountKey) -> int:
+        return self.generations[key[0]]
+
+    def put(self, key: CountKey, count: int, generation: int):
+        if (self.generations[key[0]] == generation):
+            self.counts[key] = count
+
+    def invalidate(self, table: str, scope: Optional[str] = None):
+        self.generations[table] += 1
+        for key in [key for key in self.counts if key[0] == table and (scope is None or key[1] in (None, scope))]:
+            del self.counts[key]
+
+    def clear(self):
+        for table in self.generations:
+            self.generations[table] += 1
+        self.counts.clear()
+
+    def snapshot(self) -> dict:
+        return {'entries': len(self.counts), 'hits': self.hits, 'misses': self.misses}
+
+    def _ensure_subscribed(self):
+        if (self.subscriptions):
+            return
+        self.subscriptions = [
+            SubscriptionService.subscribe('expenses', self._on_expenses),
+            SubscriptionService.subscribe('month', self._on_month),
+        ]
+        SubscriptionService.on_reconnect(self.clear)
+
+    def _on_expenses(self, payload: str):
+        self.invalidate('expenses')
+
+    def _on_month(self, payload: str):
+        # Bills and income notify their month as well
+        month_id, _ = parse_notification(payload)
+        logger.debug(f"Invalidating counts of month {month_id}")
+        self.invalidate('months')
+        self.invalidate('bills', month_id)
+        self.invalidate('income', month_id)
+
+
+count_cache = CountCache()
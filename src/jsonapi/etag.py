@@ -0,0 +1,30 @@
+import zlib
+
+from fastapi import Request, Response
+
+
+def month_etag(resource: str, month_id: str, version: int | None, request: Request) -> str | None:
+    """
+    Strong ETag of a resource of a month, from the month version and the query (a page is part of the representation)
+    """
+    if (version is None):
+        return None
+    query = zlib.crc32(str(request.query_params).encode())
+    return f'"{resource}-{month_id}-{version}-{query:08x}"'
+
+
+def not_modified(request: Request, response: Response, etag: str | None) -> Response | None:
+    """
+    Returns the 304 response if the client already has the representation tagged by etag,
+    otherwise tags the response that is going to be built
+    """
+    if (etag is None):
+        return None
+    response.headers['ETag'] = etag
+    if_none_match = request.headers.get('if-none-match')
+    if (if_none_match is None):
+        return None
+    tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    if (etag in tags or '*' in tags):
+        return Response(status_code=304, headers={'ETag': etag})
+    return None
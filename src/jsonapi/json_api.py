@@ -1,24 +1,42 @@
+from enum import Enum
 from typing import Any, Generic, Optional, Sequence, TypeVar
 
 from fastapi import Query
+from fastapi.responses import JSONResponse
 from fastapi_pagination.bases import AbstractPage, AbstractParams, RawParams
 from pydantic import BaseModel
 from typing_extensions import Self
 
 
+class JSONAPICount(str, Enum):
+    exact = "exact"
+    # Planner estimate from table statistics
+    estimate = "estimate"
+    none = "none"
+
+
 class JSONAPIParams(BaseModel, AbstractParams):
     offset: int = Query(0, ge=0, alias="offset")
     limit: int = Query(10, ge=1, le=100, alias="limit")
+    # Opaque keyset cursor, an empty value asks for the first page in cursor mode
+    after: Optional[str] = Query(None, alias="after")
+    count: JSONAPICount = Query(JSONAPICount.exact, alias="count")
+
+    def is_cursor(self) -> bool:
+        return self.after is not None
 
     def to_raw_params(self) -> RawParams:
         return RawParams(limit=self.limit, offset=self.offset)
 
 
 class JSONAPIPageInfoMeta(BaseModel):
-    total_count: int
+    total_count: Optional[int] = None
+    total_count_estimated: Optional[bool] = None
     count: int
-    offset: int
+    offset: Optional[int] = None
     limit: int
+    next_cursor: Optional[str] = None
+    has_more: Optional[bool] = None
 
 
 class JSONAPIPageMeta(BaseModel):
@@ -44,16 +62,22 @@ class JSONAPIPage(AbstractPage[T], Generic[T]):
             **kwargs: Any,
     ) -> Self:
         assert isinstance(params, JSONAPIParams)
-        assert total is not None
+        assert total is not None or params.count != JSONAPICount.exact
+        next_cursor = kwargs.pop("next_cursor", None)
+        has_more = kwargs.pop("has_more", None)
 
         return cls(
             data=items,
             meta={
                 "page": {
                     "total_count": total,
+                    "total_count_estimated": True if params.count == JSONAPICount.estimate else None,
                     "count": len(items),
-                    "offset": params.offset,
+                    "offset": None if params.is_cursor() else params.offset,
                     "limit": params.limit,
+                    "next_cursor": next_cursor,
+                    # Without an exact total, tells infinite scroll clients whether to ask for more
+                    "has_more": has_more if params.count != JSONAPICount.exact else None,
                 }
             },
             **kwargs,
@@ -62,10 +86,11 @@ class JSONAPIPage(AbstractPage[T], Generic[T]):
 
 class JSONAPIResponse(BaseModel, Generic[T]):
     data: T
+    meta: Optional[dict[str, Any]] = None
 
     @classmethod
-    def create(cls, data: T) -> Self:
-        return cls(data=data)
+    def create(cls, data: T, meta: Optional[dict[str, Any]] = None) -> Self:
+        return cls(data=data, meta=meta)
 
 
 class JSONAPIError(BaseModel):
@@ -83,3 +108,15 @@ class JSONAPIErrorResponse(BaseModel):
     @classmethod
     def create(cls, errors: Sequence[JSONAPIError]) -> Self:
         return cls(errors=errors)
+
+
+class JSONAPIJSONResponse(JSONResponse):
+    """
+    Renders a JSON:API document built from already validated VOs straight to bytes.
+    Returning it from a route skips FastAPI's response_model validation, the response_model stays for the docs
+    """
+
+    def render(self, content: Any) -> bytes:
+        if (isinstance(content, BaseModel)):
+            return content.model_dump_json(exclude_none=True).encode("utf-8")
+        return super().render(content)
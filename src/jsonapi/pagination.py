@@ -0,0 +1,109 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, Optional, Sequence
+
+from sqlalchemy import Select, func, literal, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from src.errors.UserError import UserError
+from src.jsonapi.count_cache import CountKey, count_cache
+from src.jsonapi.json_api import JSONAPICount, JSONAPIPage, JSONAPIParams
+from src.settings.settings import app_settings
+
+
+async def paginate(db: AsyncSession, query: Select, params: JSONAPIParams, *,
+                   order: Sequence[InstrumentedAttribute], transformer: Callable[[Sequence[Any]], Sequence[Any]],
+                   descending: bool = False, count_key: Optional[CountKey] = None) -> JSONAPIPage:
+    """
+    Pages query, a select of columns labelled with their attribute keys, ordered by order, which must end
+    with a unique column. With an after cursor the page is fetched with a keyset condition on the cursor,
+    otherwise with limit/offset. The total is counted, estimated or skipped as asked by the count param;
+    exact counts are cached under count_key.
+    """
+    ordering = [column.desc() if descending else column for column in order]
+    if (params.is_cursor()):
+        values = decode_cursor(params.after, order) if params.after else None
+        rows = await _fetch_after(db, query, order, values, descending, params.limit + 1)
+    else:
+        page_query = query.order_by(*ordering).offset(params.offset).limit(params.limit + 1)
+        rows = list((await db.execute(page_query)).all())
+
+    has_more = len(rows) > params.limit
+    rows = rows[:params.limit]
+    next_cursor = None
+    if (params.is_cursor() and has_more):
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in order])
+    total = await _total(db, query, params, count_key)
+    return JSONAPIPage.create(transformer(rows), params, total=total, next_cursor=next_cursor, has_more=has_more)
+
+
+async def _total(db: AsyncSession, query: Select, params: JSONAPIParams,
+                 count_key: Optional[CountKey]) -> Optional[int]:
+    if (params.count == JSONAPICount.none):
+        return None
+    if (params.count == JSONAPICount.estimate):
+        return await _estimate(db, query)
+    if (count_key is None or not app_settings.page_count_cache):
+        return await db.scalar(select(func.count()).select_from(query.subquery()))
+
+    total = count_cache.get(count_key)
+    if (total is None):
+        generation = count_cache.generation(count_key)
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        count_cache.put(count_key, total, generation)
+    return total
+
+
+async def _estimate(db: AsyncSession, query: Select) -> int:
+    statement = query.compile(dialect=db.bind.dialect, compile_kwargs={'literal_binds': True})
+    # Sent as is, text() would take a ":name" in the rendered values for a bind parameter
+    connection = await db.connection()
+    plan = (await connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}')).scalar()
+    if (isinstance(plan, str)):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def encode_cursor(values: list[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str, order: Sequence[InstrumentedAttribute]) -> list[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if (not isinstance(values, list) or len(values) != len(order)):
+            raise UserError("Invalid page cursor")
+        return [None if value is None else column.type.python_type(value) for column, value in zip(order, values)]
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise UserError("Invalid page cursor", e)
+
+
+async def _fetch_after(db: AsyncSession, query: Select, order: Sequence[InstrumentedAttribute],
+                       values: list[Any] | None, descending: bool, limit: int) -> list[Any]:
+    """
+    Fetches the rows after values. Postgres sorts nulls last in ascending order, so the nulls of a nullable
+    leading key are fetched separately once its values run out, keeping each query an index range scan.
+    """
+    first, *rest = order
+    ordering = [column.desc() if descending else column for column in order]
+    nulls_last = not descending and first.property.columns[0].nullable
+    if (values is not None and values[0] is None):
+        nulls_query = query.where(first.is_(None), _compare(rest, values[1:], descending))
+        return list((await db.execute(nulls_query.order_by(*ordering).limit(limit))).all())
+
+    page_query = query if values is None else query.where(_compare(order, values, descending))
+    if (nulls_last):
+        page_query = page_query.where(first.is_not(None))
+    rows = list((await db.execute(page_query.order_by(*ordering).limit(limit))).all())
+    if (nulls_last and len(rows) < limit):
+        nulls_query = query.where(first.is_(None)).order_by(*ordering).limit(limit - len(rows))
+        rows += (await db.execute(nulls_query)).all()
+    return rows
+
+
+def _compare(order: Sequence[InstrumentedAttribute], values: list[Any], descending: bool):
+    columns = tuple_(*order)
+    bounds = tuple_(*[literal(value, column.type) for column, value in zip(order, values)])
+    return columns < bounds if descending else columns > bounds
@@ -0,0 +1,83 @@
+import asyncio
+import itertools
+from collections import OrderedDict
+from enum import Enum
+from typing import Hashable
+
+
+class SlowConsumerPolicy(str, Enum):
+    drop_oldest = "drop_oldest"
+    collapse = "collapse"
+    disconnect = "disconnect"
+
+
+class SubscriberBuffer:
+    """
+    Bounded buffer of the frames waiting to be sent to one subscriber. When a slow subscriber lets it fill up
+    the policy decides what gives: the oldest frames are dropped, only the latest frame of each id is kept (and
+    the oldest ids dropped if that is not enough), or the subscriber is given up on and told to resync.
+    """
+    ids = itertools.count(1)
+
+    def __init__(self, channel: str, policy: SlowConsumerPolicy, size: int):
+        self.id = next(SubscriberBuffer.ids)
+        self.channel = channel
+        self.policy = policy
+        self.size = size
+        # Keyed by entity id when collapsing, by arrival otherwise
+        self.frames: OrderedDict[Hashable, str] = OrderedDict()
+        self.arrivals = itertools.count()
+        self.ready = asyncio.Event()
+        self.overflow = asyncio.Event()
+        self.delivered = 0
+        self.dropped = 0
+        self.collapsed = 0
+        self.max_lag = 0
+
+    def put(self, frames: list[tuple[str, str]]):
+        """
+        Buffers the (entity id, frame) pairs of a batch
+        """
+        if (self.overflow.is_set()):
+            return
+        for entity_id, frame in frames:
+            if (self.policy == SlowConsumerPolicy.collapse):
+                if (self.frames.pop(entity_id, None) is not None):
+                    self.collapsed += 1
+                self.frames[entity_id] = frame
+            else:
+                self.frames[next(self.arrivals)] = frame
+        excess = len(self.frames) - self.size
+        if (excess > 0 and self.policy == SlowConsumerPolicy.disconnect):
+            self.overflow.set()
+            self.dropped += len(self.frames)
+            self.frames.clear()
+        elif (excess > 0):
+            for _ in range(excess):
+                self.frames.popitem(last=False)
+            self.dropped += excess
+        self.max_lag = max(self.max_lag, len(self.frames))
+        self.ready.set()
+
+    async def get(self) -> list[str]:
+        """
+        Waits for frames and takes all of them
+        """
+        await self.ready.wait()
+        self.ready.clear()
+        frames = list(self.frames.values())
+        self.frames.clear()
+        self.delivered += len(frames)
+        return frames
+
+    def snapshot(self) -> dict:
+        return {
+            'id': self.id,
+            'channel': self.channel,
+            'policy': self.policy.value,
+            'lag': len(self.frames),
+            'max_lag': self.max_lag,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'collapsed': self.collapsed,
+        }
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+from decimal import Decimal
+from typing import Awaitable, Callable, NamedTuple, Optional, Type
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import fetch_async_connection
+from src.database.subscription import Subscription, SubscriptionService
+from src.notifications.buffer import SubscriberBuffer
+from src.settings.logging import logger
+from src.settings.settings import app_settings
+
+FEEDS = {}
+
+BULK = 'bulk'
+
+Resolver = Callable[[AsyncSession, list[str]], Awaitable[list[BaseModel]]]
+
+
+class Change(NamedTuple):
+    action: str
+    # Changed row, when the trigger sent it along with the notification
+    row: Optional[dict] = None
+
+
+def channel_kind(channel: str) -> str:
+    """
+    Name of the channel without its entity suffix (bill_2024_01 -> bill)
+    """
+    return channel.split('_', 1)[0]
+
+
+def debounce_window(channel: str) -> float:
+    overrides = app_settings.notify_debounce_ms_by_channel
+    window_ms = overrides.get(channel, overrides.get(channel_kind(channel), app_settings.notify_debounce_ms))
+    return max(window_ms, 0) / 1000
+
+
+class FeedMetrics:
+    """
+    Counters per channel kind: notifications received, notifications collapsed into another one of
+    the same batch, batches delivered to the subscribers and queries run to resolve them
+    """
+
+    def __init__(self):
+        self.received = defaultdict(int)
+        self.collapsed = defaultdict(int)
+        self.batches = defaultdict(int)
+        self.queries = defaultdict(int)
+        self.rows_decoded = defaultdict(int)
+
+    def snapshot(self) -> dict:
+        return {
+            kind: {
+                'received': self.received[kind],
+                'collapsed': self.collapsed[kind],
+                'batches': self.batches[kind],
+                'queries': self.queries[kind],
+                'rows_decoded': self.rows_decoded[kind],
+            }
+            for kind in self.received
+        }
+
+
+metrics = FeedMetrics()
+
+
+class ChannelFeed:
+    """
+    Coalesces the notifications of one channel. Notifications received within the debounce window
+    are collected by id, keeping only the latest action of each id. Each batch is resolved and encoded
+    once, and the same frames are handed to every subscriber buffer. Rows carried by the notification
+    are decoded into row_model, only the remaining ids are resolved.
+
+    Every frame gets the next sequence number of the channel, the latest frames are kept so a client
+    resuming from a sequence number is replayed what it missed. The numbers start from the clock, so
+    the ones of an earlier feed of the channel are never mistaken for the current ones; the feed is kept
+    a while after its last subscriber leaves, for the clients that reconnect.
+    """
+
+    def __init__(self, channel: str, resolver: Resolver, row_model: Optional[Type[BaseModel]] = None):
+        self.channel = channel
+        self.kind = channel_kind(channel)
+        self.window = debounce_window(channel)
+        self.resolver = resolver
+        self.row_model = row_model
+        self.buffers: list[SubscriberBuffer] = []
+        self.pending: dict[str, Change] = {}
+        self.flush_handle: Optional[asyncio.Handle] = None
+        self.subscription: Optional[Subscription] = None
+        self.close_handle: Optional[asyncio.TimerHandle] = None
+        self.seq = time.time_ns() // 1000
+        self.history: deque[tuple[int, str, str]] = deque(maxlen=app_settings.notify_replay_size)
+        # Batches are published one at a time so subscribers never see them out of order
+        self.publishing = asyncio.Lock()
+
+    def join(self, buffer: SubscriberBuffer):
+        self.buffers.append(buffer)
+        if (self.close_handle is not None):
+            self.close_handle.cancel()
+            self.close_handle = None
+        if (self.subscription is None):
+            self.subscription = SubscriptionService.subscribe(self.channel, self.on_notify)
+
+    def leave(self, buffer: SubscriberBuffer):
+        if (buffer in self.buffers):
+            self.buffers.remove(buffer)
+        if (not self.buffers and self.close_handle is None):
+            self.close_handle = asyncio.get_running_loop().call_later(app_settings.notify_replay_retention_seconds,
+                                                                      self.close)
+
+    def replay(self, since: int) -> Optional[list[tuple[str, str]]]:
+        """
+        (entity id, frame) pairs published after since, None when the history doesn't reach back to it
+        """
+        floor = self.history[0][0] - 1 if self.history else self.seq
+        if (since < floor or since > self.seq):
+            return None
+        return [(entity_id, frame) for seq, entity_id, frame in self.history if seq > since]
+
+    def reset_history(self):
+        # Skipping a number keeps clients at the last one from being told they missed nothing
+        self.history.clear()
+        self.seq += 1
+
+    def close(self):
+        if (self.close_handle is not None):
+            self.close_handle.cancel()
+            self.close_handle = None
+        if (self.subscription is not None):
+            self.subscription.unsubscribe()
+            self.subscription = None
+        if (self.flush_handle is not None):
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        self.pending.clear()
+        FEEDS.pop(self.channel, None)
+
+    def on_notify(self, payload: str):
+        entity_id, change = parse_notification(payload)
+        metrics.received[self.kind] += 1
+        if (change.action == BULK or '' in self.pending):
+            # The resync frame of a bulk change stands for every other change of the batch
+            metrics.collapsed[self.kind] += len(self.pending)
+            self.pending = {'': Change(BULK)}
+        else:
+            if (entity_id in self.pending):
+                metrics.collapsed[self.kind] += 1
+            # The latest action wins, the id keeps its original position in the batch
+            self.pending[entity_id] = change
+        if (self.flush_handle is None):
+            self.flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+    def flush(self):
+        self.flush_handle = None
+        if (not self.pending):
+            return
+        batch = self.pending
+        self.pending = {}
+        asyncio.ensure_future(self.publish(batch))
+
+    async def publish(self, batch: dict[str, Change]):
+        async with self.publishing:
+            try:
+                changes = await self.encode(batch)
+            except Exception:
+                logger.exception(f'Exception resolving changes on {self.channel}, asking subscribers to resync')
+                # The batch is lost, a sequenced resync frame keeps resuming clients from skipping it unaware
+                changes = [('', 'resync', {})]
+            frames = []
+            for entity_id, action, data in changes:
+                self.seq += 1
+                frame = encode_frame(action, data, self.seq)
+                self.history.append((self.seq, entity_id, frame))
+                frames.append((entity_id, frame))
+            metrics.batches[self.kind] += 1
+            logger.info(f"Delivering {len(frames)} changes on {self.channel} to {len(self.buffers)} subscribers")
+            for buffer in self.buffers:
+                buffer.put(frames)
+
+    async def encode(self, batch: dict[str, Change]) -> list[tuple[str, str, dict]]:
+        """
+        (entity id, action, data) of the frames of the batch
+        """
+        if ('' in batch):
+            # Too many changes to tell one by one, subscribers reload the channel
+            return [('', 'resync', {})]
+        frames = [(entity_id, 'delete', {'id': entity_id})
+                  for entity_id, change in batch.items() if change.action == 'del']
+        entities = []
+        missing = []
+        for entity_id, change in batch.items():
+            if (change.action == 'del'):
+                continue
+            if (change.row is not None and self.row_model is not None):
+                metrics.rows_decoded[self.kind] += 1
+                entities.append(self.row_model.model_validate(change.row))
+            else:
+                missing.append(entity_id)
+        if (missing):
+            metrics.queries[self.kind] += 1
+            entities += await self._resolve(missing)
+        return frames + [(str(entity.id), 'update', entity.model_dump(mode='json')) for entity in entities]
+
+    async def _resolve(self, entity_ids: list[str]) -> list[BaseModel]:
+        async with fetch_async_connection() as db:
+            return await self.resolver(db, entity_ids)
+
+
+def _reset_histories():
+    # Notifications sent while disconnected are lost, the histories no longer tell everything that was missed
+    for feed in FEEDS.values():
+        feed.reset_history()
+
+
+SubscriptionService.on_reconnect(_reset_histories)
+
+
+class FeedService:
+
+    @staticmethod
+    def join(channel: str, buffer: SubscriberBuffer, resolver: Resolver,
+             row_model: Optional[Type[BaseModel]] = None) -> ChannelFeed:
+        feed = FEEDS.get(channel)
+        if (feed is None):
+            feed = ChannelFeed(channel, resolver, row_model)
+            FEEDS[channel] = feed
+        feed.join(buffer)
+        return feed
+
+    @staticmethod
+    def subscribers() -> list[dict]:
+        return [buffer.snapshot() for feed in FEEDS.values() for buffer in feed.buffers]
+
+
+def encode_frame(action: str, data: dict, seq: Optional[int] = None) -> str:
+    # Same encoding as WebSocket.send_json, done once for all subscribers
+    frame = {'action': action, 'data': data} if seq is None else {'action': action, 'seq': seq, 'data': data}
+    return json.dumps(frame, separators=(",", ":"), ensure_ascii=False)
+
+
+def parse_notification(payload: str) -> tuple[str, Change]:
+    """
+    Parses a trigger payload ("add <id>", "del <id>" or "row <json>") into the upper-cased id and its change.
+    "bulk", sent when rows changed with their notifications off, has no id: all of the channel may have changed.
+    """
+    if (payload == BULK):
+        return '', Change(BULK)
+    action, body = payload.split(' ', 1)
+    if (action == 'row'):
+        # Numerics are kept as Decimal so amounts match the ones read from the database
+        row = json.loads(body, parse_float=Decimal)
+        return str(row['id']).upper(), Change('add', row)
+    return body.upper().strip(), Change(action)
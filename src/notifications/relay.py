@@ -0,0 +1,103 @@
+"""
+Notification relay: the one process of the host holding the LISTEN connection, forwarding notifications to the
+workers connected to its Unix socket
+
+    python -m src.notifications.relay [socket path]
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+
+from src.database.subscription import NotificationListener, Subscription
+from src.settings.logging import logger
+from src.settings.settings import app_settings
+
+DEFAULT_RELAY_SOCKET = os.path.join(tempfile.gettempdir(), 'financer-notify.sock')
+# A worker that lets this much pile up unread is disconnected, it resyncs when it reconnects
+MAX_WORKER_BUFFER = 16 << 20
+RELAY_START_TIMEOUT = 10
+
+
+class NotificationRelay:
+    """
+    Workers send LISTEN/UNLISTEN lines for their channels, the relay LISTENs on a channel while some worker does
+    and sends them NOTIFY lines for its notifications. A RECONNECT line tells them notifications may have been
+    lost while the relay was disconnected from the database.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.listener = NotificationListener()
+        self.listener.reconnect_callbacks.append(self._broadcast_reconnect)
+        self.workers: set[asyncio.StreamWriter] = set()
+
+    async def serve(self, ready=None):
+        if (os.path.exists(self.path)):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self._handle_worker, path=self.path)
+        logger.info(f'Notification relay listening on {self.path}')
+        if (ready is not None):
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.workers.add(writer)
+        subscriptions: dict[str, Subscription] = {}
+        try:
+            while (line := await reader.readline()):
+                verb, channel = json.loads(line)
+                if (verb == 'LISTEN' and channel not in subscriptions):
+                    subscriptions[channel] = Subscription(channel, lambda payload, channel=channel:
+                                                          self._send(writer, 'NOTIFY', channel, payload))
+                    self.listener.add(subscriptions[channel])
+                elif (verb == 'UNLISTEN' and channel in subscriptions):
+                    self.listener.remove(subscriptions.pop(channel))
+        except (ConnectionError, ValueError):
+            logger.exception('Notification relay worker connection failed')
+        finally:
+            for subscription in subscriptions.values():
+                self.listener.remove(subscription)
+            self.workers.discard(writer)
+            writer.close()
+
+    def _send(self, writer: asyncio.StreamWriter, *message: str):
+        if (writer.is_closing()):
+            return
+        if (writer.transport.get_write_buffer_size() > MAX_WORKER_BUFFER):
+            logger.warning('Notification relay worker is not reading, disconnecting it')
+            writer.close()
+            return
+        writer.write(json.dumps(message).encode() + b'\n')
+
+    def _broadcast_reconnect(self):
+        for writer in self.workers:
+            self._send(writer, 'RECONNECT')
+
+
+def run_relay(path: str, ready=None):
+    try:
+        asyncio.run(NotificationRelay(path).serve(ready))
+    except KeyboardInterrupt:
+        pass
+
+
+def start_relay(path: str) -> multiprocessing.Process:
+    """
+    Starts the relay in its own process, returns once it accepts workers
+    """
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    process = context.Process(target=run_relay, args=(path, ready), name='notification-relay', daemon=True)
+    process.start()
+    if (not ready.wait(RELAY_START_TIMEOUT)):
+        process.terminate()
+        raise RuntimeError('Notification relay did not start')
+    return process
+
+
+if (__name__ == '__main__'):
+    run_relay(sys.argv[1] if len(sys.argv) > 1 else app_settings.notify_relay_socket or DEFAULT_RELAY_SOCKET)
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Optional, Type
+
+from fastapi import WebSocket
+from pydantic import BaseModel
+from starlette.websockets import WebSocketDisconnect
+
+from src.notifications.buffer import SlowConsumerPolicy, SubscriberBuffer
+from src.notifications.feed import FeedService, Resolver, encode_frame
+from src.settings.logging import logger
+from src.settings.settings import app_settings
+
+# Close code telling the client to come back later, after reloading what it missed
+RESYNC_CLOSE_CODE = 1013
+RESYNC_TIMEOUT_SECONDS = 5
+
+
+async def serve_subscription(websocket: WebSocket, channel: str, resolver: Resolver,
+                             row_model: Optional[Type[BaseModel]] = None):
+    """
+    Sends the frames published on the channel to the client until it disconnects. Changes are
+    resolved with the resolver (or decoded into row_model when the notification carries the row)
+    once per channel, not once per client. The handler waits on the subscriber buffer and on the
+    socket at the same time, so an idle connection is never woken up. The buffer is bounded, the
+    ?policy= of the client (or the configured one) decides what happens when it can't keep up.
+    A client resuming with ?since=<seq> first gets the frames it missed, or a resync frame when
+    they are no longer known. Changes made in bulk (an import) are published as a resync frame too.
+    """
+    try:
+        policy = SlowConsumerPolicy(websocket.query_params.get('policy', app_settings.notify_slow_consumer_policy))
+        since = websocket.query_params.get('since')
+        since = int(since) if since is not None else None
+    except ValueError:
+        await websocket.close(code=1008, reason='Invalid policy or since')
+        return
+    buffer = SubscriberBuffer(channel, policy, app_settings.notify_buffer_size)
+    feed = FeedService.join(channel, buffer, resolver, row_model)
+    if (since is not None):
+        missed = feed.replay(since)
+        if (missed is None or len(missed) > buffer.size):
+            logger.info(f'Subscriber {buffer.id} of {channel} resumed from {since}, too far back to replay')
+            buffer.put([('', encode_frame('resync', {}, feed.seq))])
+        else:
+            buffer.put(missed)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(websocket))
+    # Sending is given up on too when the buffer overflows, a stalled client would block it forever
+    overflowed = asyncio.ensure_future(buffer.overflow.wait())
+    try:
+        while True:
+            frames = asyncio.ensure_future(buffer.get())
+            done, _ = await asyncio.wait({frames, disconnected, overflowed}, return_when=asyncio.FIRST_COMPLETED)
+            if (frames not in done):
+                frames.cancel()
+            else:
+                sending = asyncio.ensure_future(_send_frames(websocket, frames.result()))
+                done, _ = await asyncio.wait({sending, disconnected, overflowed}, return_when=asyncio.FIRST_COMPLETED)
+                if (sending in done):
+                    sending.result()
+                    continue
+                sending.cancel()
+            if (overflowed in done):
+                logger.warning(f'Subscriber {buffer.id} of {channel} fell behind, asking it to resync')
+                await asyncio.wait_for(_ask_resync(websocket, buffer), RESYNC_TIMEOUT_SECONDS)
+            break
+    except WebSocketDisconnect:
+        logger.info('Connection has been closed')
+    except asyncio.TimeoutError:
+        logger.info(f'Subscriber {buffer.id} of {channel} did not take the resync request, dropping it')
+    finally:
+        feed.leave(buffer)
+        disconnected.cancel()
+        overflowed.cancel()
+
+
+async def _send_frames(websocket: WebSocket, frames: list[str]):
+    for frame in frames:
+        await websocket.send_text(frame)
+
+
+async def _ask_resync(websocket: WebSocket, buffer: SubscriberBuffer):
+    await websocket.send_text(encode_frame('resync', {'dropped': buffer.dropped}))
+    await websocket.close(code=RESYNC_CLOSE_CODE, reason='Too slow, resync')
+
+
+async def _wait_for_disconnect(websocket: WebSocket):
+    while True:
+        message = await websocket.receive()
+        if (message['type'] == 'websocket.disconnect'):
+            # Connection closed by client
+            logger.info('Connection has been closed')
+            return
+        # Received some data from the client, ignore it
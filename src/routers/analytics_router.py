@@ -0,0 +1,31 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import get_async_db
+from src.jsonapi.json_api import JSONAPIJSONResponse, JSONAPIResponse
+from src.schemas.analytics_vo import BillTrendVo, MonthBalanceVo, PaidOnTimeVo, YearTotalsVo
+from src.services.analytics_service import AnalyticsService
+
+router = APIRouter(prefix="/analytics")
+
+
+@router.get("/years", response_model=JSONAPIResponse[list[YearTotalsVo]], response_model_exclude_none=True)
+async def get_years(db: AsyncSession = Depends(get_async_db)):
+    return JSONAPIJSONResponse(JSONAPIResponse(data=await AnalyticsService.get_years(db)))
+
+
+@router.get("/balance", response_model=JSONAPIResponse[list[MonthBalanceVo]], response_model_exclude_none=True)
+async def get_balance(year: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
+    return JSONAPIJSONResponse(JSONAPIResponse(data=await AnalyticsService.get_balance(db, year)))
+
+
+@router.get("/bills/trends", response_model=JSONAPIResponse[list[BillTrendVo]], response_model_exclude_none=True)
+async def get_bill_trends(name: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    return JSONAPIJSONResponse(JSONAPIResponse(data=await AnalyticsService.get_bill_trends(db, name)))
+
+
+@router.get("/bills/on-time", response_model=JSONAPIResponse[list[PaidOnTimeVo]], response_model_exclude_none=True)
+async def get_paid_on_time(year: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
+    return JSONAPIJSONResponse(JSONAPIResponse(data=await AnalyticsService.get_paid_on_time(db, year)))
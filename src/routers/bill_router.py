@@ -1,16 +1,14 @@
-import asyncio
-from queue import Empty, Queue
-
-from fastapi import APIRouter, Depends, Response, WebSocket
-from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy.orm import Session
-from starlette.websockets import WebSocketDisconnect
-
-from src.database.db import get_db
-from src.database.subscription import SubscriptionService
-from src.jsonapi.json_api import JSONAPIPage, JSONAPIParams, JSONAPIResponse
-from src.schemas.bill_vo import BillUpdateVo, BillVo
+from fastapi import APIRouter, Depends, Request, Response, WebSocket
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import get_async_db
+from src.jsonapi.etag import month_etag, not_modified
+from src.jsonapi.json_api import JSONAPIJSONResponse, JSONAPIPage, JSONAPIParams, JSONAPIResponse
+from src.jsonapi.pagination import paginate
+from src.notifications.websocket import serve_subscription
+from src.schemas.bill_vo import BillBulkUpdateVo, BillUpdateVo, BillVo
 from src.services.bill_service import BillService
+from src.services.month_service import MonthService
 from src.settings.logging import logger
 
 router = APIRouter(prefix="/bill")
@@ -18,80 +16,58 @@ active_connections_set = set()
 
 
 @router.get("/", response_model=JSONAPIPage[BillVo], response_model_exclude_none=True)
-def get_all_bills(db: Session = Depends(get_db), params: JSONAPIParams = Depends()):
-    return BillService.get_all_paginated(db, paginate, params)
+async def get_all_bills(db: AsyncSession = Depends(get_async_db), params: JSONAPIParams = Depends()):
+    return JSONAPIJSONResponse(await BillService.get_all_paginated(db, paginate, params))
 
 
 @router.get("/{month_id}", response_model=JSONAPIPage[BillVo], response_model_exclude_none=True)
-def get_all_bills_by_month(month_id: str, db: Session = Depends(get_db), params: JSONAPIParams = Depends()):
-    return BillService.get_paginated_by_month(db, month_id, paginate, params)
+async def get_all_bills_by_month(month_id: str, request: Request, response: Response,
+                                 db: AsyncSession = Depends(get_async_db), params: JSONAPIParams = Depends()):
+    etag = month_etag('bill', month_id, await MonthService.get_version(month_id, db), request)
+    if (cached := not_modified(request, response, etag)):
+        return cached
+    page = await BillService.get_paginated_by_month(db, month_id, paginate, params)
+    return JSONAPIJSONResponse(page, headers=response.headers)
 
 
 @router.post("/{month_id}", response_model=JSONAPIResponse[BillVo], response_model_exclude_none=True)
-def create_bill(month_id: str, bill: BillUpdateVo, db: Session = Depends(get_db)):
+async def create_bill(month_id: str, bill: BillUpdateVo, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Creating bill in month {month_id}")
-    updated_bill = BillService.create(db, month_id, bill)
-    return JSONAPIResponse(data=updated_bill)
+    updated_bill = await BillService.create(db, month_id, bill)
+    return JSONAPIJSONResponse(JSONAPIResponse(data=updated_bill))
+
+
+@router.patch("/{month_id}/bulk", response_model=JSONAPIResponse[list[BillVo]], response_model_exclude_none=True)
+async def bulk_update_bills(month_id: str, changes: BillBulkUpdateVo, db: AsyncSession = Depends(get_async_db)):
+    logger.info(f"Updating bills of month {month_id}")
+    updated_bills = await BillService.bulk_update(db, month_id, changes)
+    return JSONAPIJSONResponse(JSONAPIResponse(data=updated_bills))
 
 
 @router.delete("/{bill_id}")
-def delete_bill(bill_id: str, response: Response, db: Session = Depends(get_db)):
+async def delete_bill(bill_id: str, response: Response, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Deleting bill {bill_id}")
-    BillService.delete(db, bill_id)
+    await BillService.delete(db, bill_id)
     response.status_code = 204
 
 
 @router.patch("/{bill_id}", response_model=JSONAPIResponse[BillVo], response_model_exclude_none=True)
-def update_expense(bill_id: str, bill: BillUpdateVo, db: Session = Depends(get_db)):
+async def update_expense(bill_id: str, bill: BillUpdateVo, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Updating bill {bill_id}")
-    updated_bill = BillService.update(db, bill_id, bill)
-    return JSONAPIResponse(data=updated_bill)
+    updated_bill = await BillService.update(db, bill_id, bill)
+    return JSONAPIJSONResponse(JSONAPIResponse(data=updated_bill))
 
 
 @router.websocket("/ws/{month_id}")
-async def expenses_subscription(month_id: str, websocket: WebSocket, db: Session = Depends(get_db)):
+async def expenses_subscription(month_id: str, websocket: WebSocket):
     await websocket.accept()
     active_connections_set.add(websocket)
     logger.info('Websocket connection established')
-    queue = Queue()
-    active = True
-    subscription = SubscriptionService.subscribe(f'bill_{month_id}', queue, lambda: active)
-    logger.info(f'Subscribed to bills on month {month_id}')
 
-    while True:
-        try:
-            data = queue.get_nowait()
-            if ('del' in data):
-                await websocket.send_json(
-                    {
-                        'action': 'delete',
-                        'data':
-                            {
-                                'id': data.split(' ')[1].upper().strip()
-                            }
-                    }
-                )
-                logger.info(f"Deleted expense {data.split(' ')[1]}")
-            else:
-                bill_id = data.split(' ')[1].upper().strip()
-                response = BillService.get_by_id(db, bill_id)
-                await websocket.send_json(
-                    {
-                        'action': 'update',
-                        'data': response.model_dump(mode='json')
-                    }
-                )
-                logger.info(f"Updated bill {bill_id}")
-        except Empty:
-            still_active = await _is_connection_alive(websocket)
-            if (still_active):
-                continue
-            else:
-                break
+    logger.info(f'Subscribed to bills on month {month_id}')
+    await serve_subscription(websocket, f'bill_{month_id}', BillService.get_list_by_id, BillVo)
 
     logger.info('Websocket connection closed')
-    active = False
-    subscription.unsubscribe()
     active_connections_set.remove(websocket)
 
 
@@ -101,17 +77,3 @@ async def shutdown():
     for websocket in active_connections_set:
         await websocket.close(code=1001)
 
-
-async def _is_connection_alive(websocket: WebSocket):
-    try:
-        await asyncio.wait_for(websocket.receive_bytes(), timeout=0.01)
-    except asyncio.TimeoutError:
-        # Connection is still alive
-        return True
-    except WebSocketDisconnect:
-        # Connection closed by client
-        logger.info('Connection has been closed')
-        return False
-    else:
-        # Received some data from the client, ignore it
-        return True
@@ -0,0 +1,28 @@
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+
+from src.schemas.export_vo import ExportFormat, ExportKind
+from src.services.export_service import ExportService
+from src.settings.logging import logger
+
+router = APIRouter(prefix="/export")
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: 'application/x-ndjson',
+    ExportFormat.csv: 'text/csv',
+}
+
+
+@router.get("/{kind}")
+async def export_rows(kind: ExportKind, format: ExportFormat = ExportFormat.ndjson, month_id: Optional[str] = None,
+                      gzip: bool = False):
+    logger.info(f"Exporting {kind.value} as {format.value}")
+    # Checked before the response starts, errors can't be reported once the body is streaming
+    ExportService.query(kind, month_id)
+    headers = {'Content-Disposition': f'attachment; filename="{kind.value}.{format.value}"'}
+    if (gzip):
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(ExportService.stream(kind, format, month_id, gzip), media_type=MEDIA_TYPES[format],
+                             headers=headers)
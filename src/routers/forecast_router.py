@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import get_async_db
+from src.jsonapi.json_api import JSONAPIJSONResponse, JSONAPIResponse
+from src.schemas.forecast_vo import ForecastPointVo, ForecastRequest
+from src.services.forecast_service import ForecastService
+
+router = APIRouter(prefix="/forecast")
+
+
+@router.post("/", response_model=JSONAPIResponse[list[ForecastPointVo]], response_model_exclude_none=True)
+async def forecast(spec: ForecastRequest, db: AsyncSession = Depends(get_async_db)):
+    points, meta = await ForecastService.forecast(db, spec)
+    return JSONAPIJSONResponse(JSONAPIResponse(data=points, meta=meta))
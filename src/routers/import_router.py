@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import get_async_db
+from src.jsonapi.json_api import JSONAPIJSONResponse, JSONAPIResponse
+from src.schemas.import_vo import ImportKind, ImportResultVo
+from src.services.import_service import ImportService, lines_of
+from src.settings.logging import logger
+
+router = APIRouter(prefix="/import")
+
+CSV_BODY = {'requestBody': {'required': True, 'content': {'text/csv': {'schema': {'type': 'string'}}}}}
+
+
+@router.post("/{kind}", response_model=JSONAPIResponse[ImportResultVo], response_model_exclude_none=True,
+             openapi_extra=CSV_BODY)
+async def import_csv(kind: ImportKind, request: Request, notify: bool = False,
+                     db: AsyncSession = Depends(get_async_db)):
+    logger.info(f"Importing {kind.value}")
+    result = await ImportService.import_csv(db, kind, lines_of(request.stream()), notify)
+    logger.info(f"Imported {result.rows} {kind.value}")
+    return JSONAPIJSONResponse(JSONAPIResponse(data=result))
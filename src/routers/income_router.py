@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, Response
-from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.db import get_db
-from src.jsonapi.json_api import JSONAPIPage, JSONAPIParams, JSONAPIResponse
+from src.database.db import get_async_db
+from src.jsonapi.etag import month_etag, not_modified
+from src.jsonapi.json_api import JSONAPIJSONResponse, JSONAPIPage, JSONAPIParams, JSONAPIResponse
+from src.jsonapi.pagination import paginate
 from src.schemas.income_vo import IncomeUpdateVo, IncomeVo
 from src.services.income_service import IncomeService
+from src.services.month_service import MonthService
 from src.settings.logging import logger
 
 router = APIRouter(prefix="/income")
@@ -13,27 +15,32 @@ active_connections_set = set()
 
 
 @router.get("/", response_model=JSONAPIPage[IncomeVo], response_model_exclude_none=True)
-def get_all_income(db: Session = Depends(get_db), params: JSONAPIParams = Depends()):
-    return IncomeService.get_all_paginated(db, paginate, params)
+async def get_all_income(db: AsyncSession = Depends(get_async_db), params: JSONAPIParams = Depends()):
+    return JSONAPIJSONResponse(await IncomeService.get_all_paginated(db, paginate, params))
 
 
 @router.get("/{month_id}", response_model=JSONAPIPage[IncomeVo], response_model_exclude_none=True)
-def get_all_income_by_month(month_id: str, db: Session = Depends(get_db), params: JSONAPIParams = Depends()):
-    return IncomeService.get_paginated_by_month(db, month_id, paginate, params)
+async def get_all_income_by_month(month_id: str, request: Request, response: Response,
+                                  db: AsyncSession = Depends(get_async_db), params: JSONAPIParams = Depends()):
+    etag = month_etag('income', month_id, await MonthService.get_version(month_id, db), request)
+    if (cached := not_modified(request, response, etag)):
+        return cached
+    page = await IncomeService.get_paginated_by_month(db, month_id, paginate, params)
+    return JSONAPIJSONResponse(page, headers=response.headers)
 
 
 @router.delete("/{income_id}")
-def delete_income(income_id: str, response: Response, db: Session = Depends(get_db)):
+async def delete_income(income_id: str, response: Response, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Deleting income {income_id}")
-    IncomeService.delete(db, income_id)
+    await IncomeService.delete(db, income_id)
     response.status_code = 204
 
 
 @router.patch("/{income_id}", response_model=JSONAPIResponse[IncomeVo], response_model_exclude_none=True)
-def update_income(income_id: str, income: IncomeUpdateVo, db: Session = Depends(get_db)):
+async def update_income(income_id: str, income: IncomeUpdateVo, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Updating bill {income_id}")
-    updated_bill = IncomeService.update(db, income_id, income)
-    return JSONAPIResponse(data=updated_bill)
+    updated_bill = await IncomeService.update(db, income_id, income)
+    return JSONAPIJSONResponse(JSONAPIResponse(data=updated_bill))
 
 # @router.websocket("/ws")
 # async def expenses_subscription(websocket: WebSocket, db: Session = Depends(get_db)):
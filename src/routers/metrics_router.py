@@ -0,0 +1,38 @@
+from fastapi import APIRouter
+
+from src.database.db import async_engine, engine
+from src.database.pool import POOL_METRICS
+from src.jsonapi.count_cache import count_cache
+from src.notifications.feed import FeedService, metrics as feed_metrics
+from src.services.cache import analytics_cache, bill_cache, expense_cache, month_cache
+
+router = APIRouter(prefix="/metrics")
+
+
+@router.get("/notifications")
+async def get_notification_metrics():
+    return feed_metrics.snapshot()
+
+
+@router.get("/subscribers")
+async def get_subscriber_metrics():
+    return FeedService.subscribers()
+
+
+@router.get("/pool")
+async def get_pool_metrics():
+    return {
+        'sync': POOL_METRICS['sync'].snapshot(engine.pool),
+        'async': POOL_METRICS['async'].snapshot(async_engine.sync_engine.pool),
+    }
+
+
+@router.get("/cache")
+async def get_cache_metrics():
+    return {
+        'expenses': expense_cache.snapshot(),
+        'bills': bill_cache.snapshot(),
+        'months': month_cache.snapshot(),
+        'analytics': analytics_cache.snapshot(),
+        'counts': count_cache.snapshot(),
+    }
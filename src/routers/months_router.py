@@ -1,15 +1,12 @@
-import asyncio
-from queue import Empty, Queue
-
-from fastapi import APIRouter, Depends, Response, WebSocket
-from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy.orm import Session
-from starlette.websockets import WebSocketDisconnect
-
-from src.database.db import get_db
-from src.database.subscription import SubscriptionService
-from src.jsonapi.json_api import JSONAPIPage, JSONAPIParams, JSONAPIResponse
-from src.schemas.month_vo import MonthCreateRequest, MonthDetailsVo
+from fastapi import APIRouter, Depends, Request, Response, WebSocket
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import get_async_db
+from src.jsonapi.etag import month_etag, not_modified
+from src.jsonapi.json_api import JSONAPIJSONResponse, JSONAPIPage, JSONAPIParams, JSONAPIResponse
+from src.jsonapi.pagination import paginate
+from src.notifications.websocket import serve_subscription
+from src.schemas.month_vo import MonthBatchCreateRequest, MonthCreateRequest, MonthDetailsVo
 from src.services.month_service import MonthService
 from src.settings.logging import logger
 
@@ -18,73 +15,53 @@ active_connections_set = set()
 
 
 @router.get("/", response_model=JSONAPIPage[MonthDetailsVo], response_model_exclude_none=True)
-def get_all_months(db: Session = Depends(get_db), params: JSONAPIParams = Depends()):
-    return MonthService.get_all(db, paginate, params)
+async def get_all_months(db: AsyncSession = Depends(get_async_db), params: JSONAPIParams = Depends()):
+    return JSONAPIJSONResponse(await MonthService.get_all(db, paginate, params))
 
 
 @router.get("/{month_id}", response_model=JSONAPIResponse[MonthDetailsVo], response_model_exclude_none=True)
-def get_all_months(month_id: str, db: Session = Depends(get_db), params: JSONAPIParams = Depends()):
-    month_details = MonthService.get_details(month_id, db)
-    return JSONAPIResponse(data=month_details)
+async def get_all_months(month_id: str, request: Request, response: Response,
+                         db: AsyncSession = Depends(get_async_db), params: JSONAPIParams = Depends()):
+    # Tagged with the version the details were read at, which may come from the cache
+    month_details, version = await MonthService.get_versioned_details(month_id, db)
+    etag = month_etag('month', month_id, version, request)
+    if (cached := not_modified(request, response, etag)):
+        return cached
+    return JSONAPIJSONResponse(JSONAPIResponse(data=month_details), headers=response.headers)
 
 
 @router.delete("/{month_id}")
-def delete_month(month_id: str, response: Response, db: Session = Depends(get_db)):
+async def delete_month(month_id: str, response: Response, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Deleting month {month_id}")
-    MonthService.delete(month_id, db)
+    await MonthService.delete(month_id, db)
     response.status_code = 204
 
 
 @router.post("/create", response_model=JSONAPIResponse[MonthDetailsVo], response_model_exclude_none=True)
-def create_month(month_spec: MonthCreateRequest, db: Session = Depends(get_db)):
-    month = MonthService.create(month_spec, db)
-    return JSONAPIResponse(data=month)
+async def create_month(month_spec: MonthCreateRequest, db: AsyncSession = Depends(get_async_db)):
+    month = await MonthService.create(month_spec, db)
+    return JSONAPIJSONResponse(JSONAPIResponse(data=month))
+
+
+@router.post("/batch", response_model=JSONAPIResponse[list[MonthDetailsVo]], response_model_exclude_none=True)
+async def create_months(batch_spec: MonthBatchCreateRequest, db: AsyncSession = Depends(get_async_db)):
+    months, existing = await MonthService.create_batch(batch_spec, db)
+    logger.info(f"Created {len(months)} months, {len(existing)} already existed")
+    items = [{'id': month.id, 'status': 'created'} for month in months] \
+        + [{'id': month_id, 'status': 'exists'} for month_id in existing]
+    return JSONAPIJSONResponse(JSONAPIResponse(data=months, meta={'items': sorted(items, key=lambda item: item['id'])}))
 
 
 @router.websocket("/ws")
-async def expenses_subscription(websocket: WebSocket, db: Session = Depends(get_db)):
+async def expenses_subscription(websocket: WebSocket):
     await websocket.accept()
     active_connections_set.add(websocket)
     logger.info('Websocket connection established')
-    queue = Queue()
-    active = True
-    subscription = SubscriptionService.subscribe('month', queue, lambda: active)
-    logger.info('Subscribed to month')
 
-    while True:
-        try:
-            data = queue.get_nowait()
-            if ('del' in data):
-                await websocket.send_json(
-                    {
-                        'action': 'delete',
-                        'data':
-                            {
-                                'id': data.split(' ')[1].upper().strip()
-                            }
-                    }
-                )
-                logger.info(f"Deleted expense {data.split(' ')[1]}")
-            else:
-                month_id = data.split(' ')[1].upper().strip()
-                response = MonthService.get_details(month_id, db)
-                await websocket.send_json(
-                    {
-                        'action': 'update',
-                        'data': response.model_dump(mode='json')
-                    }
-                )
-                logger.info(f"Updated month {month_id}")
-        except Empty:
-            still_active = await _is_connection_alive(websocket)
-            if (still_active):
-                continue
-            else:
-                break
+    logger.info('Subscribed to month')
+    await serve_subscription(websocket, 'month', lambda db, month_ids: MonthService.get_details_list(month_ids, db))
 
     logger.info('Websocket connection closed')
-    active = False
-    subscription.unsubscribe()
     active_connections_set.remove(websocket)
 
 
@@ -94,17 +71,3 @@ async def shutdown():
     for websocket in active_connections_set:
         await websocket.close(code=1001)
 
-
-async def _is_connection_alive(websocket: WebSocket):
-    try:
-        await asyncio.wait_for(websocket.receive_bytes(), timeout=0.01)
-    except asyncio.TimeoutError:
-        # Connection is still alive
-        return True
-    except WebSocketDisconnect:
-        # Connection closed by client
-        logger.info('Connection has been closed')
-        return False
-    else:
-        # Received some data from the client, ignore it
-        return True
@@ -0,0 +1,46 @@
+from decimal import Decimal
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class YearTotalsVo(BaseModel):
+    year: int
+    months: int
+    total_income: Decimal
+    total_expense: Decimal
+    balance: Decimal
+
+
+class MonthBalanceVo(BaseModel):
+    """
+    Balance of a month and the running balance of every month up to it
+    """
+    id: str
+    year: int
+    month: int
+    total_income: Decimal
+    total_expense: Decimal
+    balance: Decimal
+    running_balance: Decimal
+
+
+class BillTrendVo(BaseModel):
+    """
+    Amount of the bills of one name in a month, and its change from the previous month that had it
+    """
+    name: str
+    month_id: str
+    amount: Decimal
+    change: Optional[Decimal] = None
+
+
+class PaidOnTimeVo(BaseModel):
+    """
+    Bills of a month paid at all and paid by their due date
+    """
+    month_id: str
+    bills: int
+    paid: int
+    paid_on_time: int
+    on_time_ratio: Decimal
@@ -3,7 +3,7 @@ from decimal import Decimal
 from typing import Optional
 from uuid import UUID
 
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 from src.schemas.expense_vo import to_zulu_time
 
@@ -41,3 +41,23 @@ class BillUpdateVo(BaseModel):
     class Config:
         from_attributes = True
         populate_by_name = True
+
+
+class BillBulkUpdateVo(BaseModel):
+    """
+    Changes applied at once to the bills of a month, all of them when ids is not given
+    """
+    ids: Optional[list[str]] = None
+    paid: Optional[bool] = None
+    shift_days: Optional[int] = None
+    amount_factor: Optional[Decimal] = Field(None, gt=0)
+
+    @model_validator(mode="after")
+    def has_change(self):
+        if (self.paid is None and not self.shift_days and self.amount_factor is None):
+            raise ValueError("nothing to update")
+        return self
+
+    class Config:
+        from_attributes = True
+        populate_by_name = True
@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import Boolean, Column, DECIMAL, DateTime, ForeignKey, Integer, String, text
+from sqlalchemy import BigInteger, Boolean, Column, DECIMAL, DateTime, ForeignKey, Integer, String, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped
 from sqlalchemy.sql import func
@@ -17,7 +17,7 @@ class Expense(Base):
     __tablename__ = 'expenses'
     id: Mapped[str] = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name: Mapped[str] = Column(String)
-    due_day: Mapped[int] = Column(Integer)
+    due_day: Mapped[int] = Column(Integer, nullable=False)
     amount: Mapped[Decimal] = Column(DECIMAL)
     active: Mapped[bool] = Column(Boolean, default=True)
     created_at: Mapped[datetime] = Column(DateTime, server_default=func.now())
@@ -38,7 +38,10 @@ class Month(Base):
 
 
 class MonthDetails(Base):
-    __tablename__ = 'v_month_details'
+    """
+    Month Details Model: totals of a month, maintained by triggers as its bills and income change
+    """
+    __tablename__ = 'month_summary'
     db_id: Mapped[str] = Column('id', UUID(as_uuid=True), primary_key=True, server_default=func.uuid_generate_v4())
     id: Mapped[str] = Column('slug', String, nullable=True, server_default=text("leavemealone"))
     year: Mapped[int] = Column(Integer)
@@ -49,6 +52,7 @@ class MonthDetails(Base):
     first_date_day: Mapped[int] = Column('first_date', Integer)
     last_date_day: Mapped[int] = Column('last_date', Integer)
     paid: Mapped[bool] = Column(Boolean, default=False)
+    version: Mapped[int] = Column(BigInteger)
 
 
 class Bill(Base):
@@ -75,6 +79,6 @@ class Income(Base):
     id: Mapped[str] = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name: Mapped[str] = Column(String)
     month_id: Mapped[str] = Column(String, ForeignKey(Month.id))
-    amount: Mapped[Decimal] = Column(DECIMAL)
+    amount: Mapped[Decimal] = Column(DECIMAL, nullable=False)
     created_at: Mapped[datetime] = Column(DateTime, server_default=func.now())
     updated_at: Mapped[datetime] = Column(DateTime, onupdate=func.now())
@@ -0,0 +1,13 @@
+from enum import Enum
+
+
+class ExportKind(str, Enum):
+    expenses = "expenses"
+    bills = "bills"
+    income = "income"
+    months = "months"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
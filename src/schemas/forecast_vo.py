@@ -0,0 +1,60 @@
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+# Longest horizon a forecast may project
+MAX_FORECAST_MONTHS = 600
+
+
+class ForecastGranularity(str, Enum):
+    day = "day"
+    month = "month"
+
+
+class ForecastOverrideVo(BaseModel):
+    """
+    What-if change of an expense for the forecast: the fields set replace the ones of the expense, or describe
+    a new expense when no expense_id is given
+    """
+    expense_id: Optional[str] = None
+    due_day: Optional[int] = Field(None, ge=1, le=31)
+    amount: Optional[Decimal] = None
+    active: Optional[bool] = None
+    active_until: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def complete_new_expense(self):
+        if (self.expense_id is None and (self.due_day is None or self.amount is None)):
+            raise ValueError("a new expense needs due_day and amount")
+        return self
+
+
+class ForecastRequest(BaseModel):
+    """
+    Forecast from the start month (the month after the last one created by default) for a number of months.
+    The starting balance defaults to the balance of the months before the start, the monthly income to the
+    average of the last months with income
+    """
+    start_year: Optional[int] = Field(None, ge=2023)
+    start_month: Optional[int] = Field(None, gt=0, le=12)
+    months: int = Field(12, ge=1, le=MAX_FORECAST_MONTHS)
+    granularity: ForecastGranularity = ForecastGranularity.month
+    starting_balance: Optional[Decimal] = None
+    income: Optional[Decimal] = None
+    overrides: list[ForecastOverrideVo] = []
+
+    @model_validator(mode="after")
+    def complete_start(self):
+        if ((self.start_year is None) != (self.start_month is None)):
+            raise ValueError("start_year and start_month go together")
+        return self
+
+
+class ForecastPointVo(BaseModel):
+    date: date
+    income: Decimal
+    expense: Decimal
+    balance: Decimal
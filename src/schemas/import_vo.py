@@ -0,0 +1,40 @@
+from decimal import Decimal
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+from src.schemas.bill_vo import BillUpdateVo
+from src.schemas.income_vo import IncomeUpdateVo
+
+# Slug of a month, as generated by the database
+MONTH_ID_PATTERN = r'^\d{4}_(0[1-9]|1[0-2])$'
+
+
+class ImportKind(str, Enum):
+    expenses = "expenses"
+    bills = "bills"
+    income = "income"
+
+
+class BillImportVo(BillUpdateVo):
+    """
+    Bill row of an import, its month is created when missing
+    """
+    month_id: str = Field(..., pattern=MONTH_ID_PATTERN)
+    name: str
+    amount: Decimal
+
+
+class IncomeImportVo(IncomeUpdateVo):
+    """
+    Income row of an import, its month is created when missing
+    """
+    month_id: str = Field(..., pattern=MONTH_ID_PATTERN)
+    name: str
+    amount: Decimal
+
+
+class ImportResultVo(BaseModel):
+    kind: ImportKind
+    rows: int
+    months_created: int = 0
@@ -1,7 +1,10 @@
 from decimal import Decimal
 from typing import Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+# Longest range a batch may create
+MAX_BATCH_MONTHS = 120
 
 
 class MonthCreateRequest(BaseModel):
@@ -18,6 +21,36 @@ class MonthCreateRequest(BaseModel):
         populate_by_name = True
 
 
+class MonthBatchCreateRequest(BaseModel):
+    """
+    Range of months to create, from start to end inclusive, all with the same expenses and income
+    """
+    start_year: int = Field(..., ge=2023)
+    start_month: int = Field(..., gt=0, le=12)
+    end_year: int = Field(..., ge=2023)
+    end_month: int = Field(..., gt=0, le=12)
+    expenses: list[str] = Field(..., min_length=1)
+    income_value: Optional[Decimal] = None
+
+    @model_validator(mode="after")
+    def valid_range(self):
+        count = (self.end_year - self.start_year) * 12 + self.end_month - self.start_month + 1
+        if (count < 1):
+            raise ValueError("end must not be before start")
+        if (count > MAX_BATCH_MONTHS):
+            raise ValueError(f"at most {MAX_BATCH_MONTHS} months can be created at once")
+        return self
+
+    def months(self) -> list[tuple[int, int]]:
+        start = self.start_year * 12 + self.start_month - 1
+        end = self.end_year * 12 + self.end_month - 1
+        return [(index // 12, index % 12 + 1) for index in range(start, end + 1)]
+
+    class Config:
+        from_attributes = True
+        populate_by_name = True
+
+
 class MonthDetailsVo(BaseModel):
     id: str
     year: int
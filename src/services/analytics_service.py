@@ -0,0 +1,99 @@
+from typing import Hashable, Optional, Type
+
+from pydantic import BaseModel
+from sqlalchemy import ColumnElement, Date, Numeric, Select, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.schemas.analytics_vo import BillTrendVo, MonthBalanceVo, PaidOnTimeVo, YearTotalsVo
+from src.schemas.database import Bill, Month, MonthDetails
+from src.services.cache import analytics_cache
+from src.services.projection import to_vos
+
+# Every change of a bill or income bumps the version of its month to the next value of a sequence, so the newest
+# version of a set of months changes whenever one of them does, and the count when one of them is gone
+MONTHS_FINGERPRINT = select(func.count(), func.max(MonthDetails.version))
+
+INCOME = func.coalesce(MonthDetails.total_income, 0)
+EXPENSE = func.coalesce(MonthDetails.total_expense, 0)
+
+
+class AnalyticsService:
+
+    @staticmethod
+    async def get_years(db: AsyncSession) -> list[YearTotalsVo]:
+        query = select(MonthDetails.year,
+                       func.count().label('months'),
+                       func.sum(INCOME).label('total_income'),
+                       func.sum(EXPENSE).label('total_expense'),
+                       func.sum(INCOME - EXPENSE).label('balance')) \
+            .group_by(MonthDetails.year) \
+            .order_by(MonthDetails.year)
+        return await _cached(db, ('years',), query, YearTotalsVo)
+
+    @staticmethod
+    async def get_balance(db: AsyncSession, year: Optional[int] = None) -> list[MonthBalanceVo]:
+        months = select(MonthDetails.id,
+                        MonthDetails.year,
+                        MonthDetails.month,
+                        INCOME.label('total_income'),
+                        EXPENSE.label('total_expense'),
+                        (INCOME - EXPENSE).label('balance'),
+                        func.sum(INCOME - EXPENSE).over(order_by=MonthDetails.id).label('running_balance')) \
+            .subquery()
+        # The running balance goes through every month, the year only filters what is returned
+        query = select(months).order_by(months.c.id)
+        if (year is not None):
+            query = query.where(months.c.year == year)
+        # Later months don't change the running balance of a year
+        covered = MonthDetails.year <= year if (year is not None) else None
+        return await _cached(db, ('balance', year), query, MonthBalanceVo, covered)
+
+    @staticmethod
+    async def get_bill_trends(db: AsyncSession, name: Optional[str] = None) -> list[BillTrendVo]:
+        amount = func.sum(Bill.amount)
+        query = select(Bill.name,
+                       Bill.month_id,
+                       amount.label('amount'),
+                       (amount - func.lag(amount).over(partition_by=Bill.name, order_by=Bill.month_id)).label('change')) \
+            .group_by(Bill.name, Bill.month_id) \
+            .order_by(Bill.name, Bill.month_id)
+        covered = None
+        if (name is not None):
+            query = query.where(Bill.name == name)
+            covered = MonthDetails.id.in_(select(Bill.month_id).where(Bill.name == name))
+        return await _cached(db, ('bill_trends', name), query, BillTrendVo, covered)
+
+    @staticmethod
+    async def get_paid_on_time(db: AsyncSession, year: Optional[int] = None) -> list[PaidOnTimeVo]:
+        due_date = func.bill_due_date(Month.year, Month.month, Bill.day)
+        on_time = func.count().filter(Bill.paid, cast(Bill.paid_at, Date) <= due_date)
+        query = select(Bill.month_id,
+                       func.count().label('bills'),
+                       func.count().filter(Bill.paid).label('paid'),
+                       on_time.label('paid_on_time'),
+                       func.round(cast(on_time, Numeric) / func.count(), 4).label('on_time_ratio')) \
+            .join(Month, Month.id == Bill.month_id) \
+            .group_by(Bill.month_id) \
+            .order_by(Bill.month_id)
+        covered = None
+        if (year is not None):
+            query = query.where(Month.year == year)
+            covered = MonthDetails.year == year
+        return await _cached(db, ('paid_on_time', year), query, PaidOnTimeVo, covered)
+
+
+async def _cached(db: AsyncSession, key: Hashable, query: Select, vo: Type[BaseModel],
+                  covered: Optional[ColumnElement[bool]] = None) -> list:
+    """
+    Runs query unless its result is cached for the current versions of the months it covers (all by default),
+    changes to other months leave the cached result in place
+    """
+    fingerprint_query = MONTHS_FINGERPRINT if (covered is None) else MONTHS_FINGERPRINT.where(covered)
+    fingerprint = tuple((await db.execute(fingerprint_query)).one())
+    cached = analytics_cache.get((key, fingerprint))
+    if (cached is not None):
+        return cached
+    generation = analytics_cache.generation
+    result = to_vos(vo, (await db.execute(query)).all())
+    analytics_cache.put((key, fingerprint), result, generation)
+    return result
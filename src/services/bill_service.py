@@ -1,10 +1,18 @@
-from datetime import datetime
 from uuid import UUID
 
-from sqlalchemy.orm import Session
+from sqlalchemy import any_, bindparam, case, delete, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.schemas.bill_vo import BillUpdateVo, BillVo
+from src.errors.NotFoundError import NotFoundError
+from src.schemas.bill_vo import BillBulkUpdateVo, BillUpdateVo, BillVo
 from src.schemas.database import Bill
+from src.services.cache import bill_cache, month_cache
+from src.services.projection import projection, to_vo, to_vos
+
+# Page order, the id makes it unique for cursors
+BILL_ORDER = (Bill.day, Bill.id)
+BILL_COLUMNS = projection(Bill, BillVo)
 
 
 # todo return vo
@@ -12,61 +20,119 @@ from src.schemas.database import Bill
 class BillService:
 
     @staticmethod
-    def save_all(db: Session, bills: list[Bill]) -> list[Bill]:
-        db.add_all(bills)
-        db.commit()
-        [db.refresh(bill) for bill in bills]
-        return bills
+    async def get_by_month(db: AsyncSession, month_id: str) -> list[BillVo]:
+        return to_vos(BillVo, (await db.execute(select(*BILL_COLUMNS).where(Bill.month_id == month_id))).all())
 
     @staticmethod
-    def get_by_month(db: Session, month_id: str):
-        return db.query(Bill).filter(Bill.month_id == month_id).all()
+    async def get_by_id(db: AsyncSession, id: str):
+        cached = bill_cache.get(id.upper())
+        if (cached is not None):
+            return cached
+        generation = bill_cache.generation
+        db_id = UUID(id)
+        row = (await db.execute(select(*BILL_COLUMNS).where(Bill.id == db_id))).first()
+        if (row is None):
+            raise NotFoundError("Bill not found")
+        bill = to_vo(BillVo, row)
+        bill_cache.put(bill.id, bill, generation, tag=bill.month_id)
+        return bill
 
     @staticmethod
-    def get_by_id(db: Session, id: str):
-        db_id = UUID(id)
-        bill = db.query(Bill).filter(Bill.id == db_id).first()
-        return BillVo.model_validate(bill)
+    async def get_list_by_id(db: AsyncSession, bill_ids: list[str]) -> list[BillVo]:
+        bills = [bill for bill in (bill_cache.get(bill_id.upper()) for bill_id in bill_ids) if bill is not None]
+        missing = {bill_id.upper() for bill_id in bill_ids} - {bill.id for bill in bills}
+        if (not missing):
+            return bills
+        generation = bill_cache.generation
+        db_ids = [UUID(bill_id) for bill_id in missing]
+        db_bills = (await db.execute(select(*BILL_COLUMNS).where(Bill.id.in_(db_ids)))).all()
+        for bill in to_vos(BillVo, db_bills):
+            bill_cache.put(bill.id, bill, generation, tag=bill.month_id)
+            bills.append(bill)
+        return bills
 
     @staticmethod
-    def get_all_paginated(db: Session, paginate, params):
-        return paginate(db.query(Bill).order_by(Bill.day),
-                        params,
-                        transformer=lambda bills: [BillVo.model_validate(bill) for bill in bills])
+    async def get_all_paginated(db: AsyncSession, paginate, params):
+        return await paginate(db, select(*BILL_COLUMNS),
+                              params,
+                              order=BILL_ORDER,
+                              count_key=('bills', None),
+                              transformer=lambda bills: to_vos(BillVo, bills))
 
     @staticmethod
-    def get_paginated_by_month(db: Session, month_id: str, paginate, params):
-        return paginate(db.query(Bill).filter(Bill.month_id == month_id).order_by(Bill.day),
-                        params,
-                        transformer=lambda bills: [BillVo.model_validate(bill) for bill in bills])
+    async def get_paginated_by_month(db: AsyncSession, month_id: str, paginate, params):
+        return await paginate(db, select(*BILL_COLUMNS).where(Bill.month_id == month_id),
+                              params,
+                              order=BILL_ORDER,
+                              count_key=('bills', month_id),
+                              transformer=lambda bills: to_vos(BillVo, bills))
 
     @staticmethod
-    def delete(db: Session, id: str):
+    async def delete(db: AsyncSession, id: str):
         db_id = UUID(id)
-        bill = db.query(Bill).filter(Bill.id == db_id).first()
-        db.delete(bill)
-        db.commit()
-        db.flush()
+        month_id = await db.scalar(delete(Bill).where(Bill.id == db_id).returning(Bill.month_id),
+                                   execution_options={'synchronize_session': False})
+        if (month_id is None):
+            raise NotFoundError("Bill not found")
+        await db.commit()
+        bill_cache.invalidate(id.upper())
+        month_cache.invalidate(month_id)
 
     @staticmethod
-    def create(db: Session, month_id: str, new_bill: BillUpdateVo):
+    async def create(db: AsyncSession, month_id: str, new_bill: BillUpdateVo):
         db_bill = Bill(month_id=month_id, **new_bill.model_dump())
         db.add(db_bill)
-        db.commit()
-        db.refresh(db_bill)
+        await db.commit()
+        await db.refresh(db_bill)
         return BillVo.model_validate(db_bill)
 
     @staticmethod
-    def update(db: Session, bill_id: str, updated_bill: BillUpdateVo):
+    async def update(db: AsyncSession, bill_id: str, updated_bill: BillUpdateVo):
         db_id = UUID(bill_id)
-        current_bill = db.query(Bill).filter(Bill.id == db_id).first()
-        for key, value in updated_bill.model_dump(exclude_unset=True).items():
-            if (key == 'paid'):
-                if (value and current_bill.paid_at is None):
-                    setattr(current_bill, 'paid_at', datetime.now())
-                elif (not value and current_bill.paid_at is not None):
-                    setattr(current_bill, 'paid_at', None)
-            setattr(current_bill, key, value)
-        db.commit()
-        db.refresh(current_bill)
-        return BillVo.model_validate(current_bill)
+        values = updated_bill.model_dump(exclude_unset=True)
+        if (not values):
+            return await BillService.get_by_id(db, bill_id)
+        if ('paid' in values):
+            values['paid_at'] = _paid_at(values['paid'])
+        bill = (await db.execute(update(Bill).where(Bill.id == db_id).values(values).returning(*BILL_COLUMNS),
+                                 execution_options={'synchronize_session': False})).first()
+        if (bill is None):
+            raise NotFoundError("Bill not found")
+        await db.commit()
+        bill_cache.invalidate(bill_id.upper())
+        month_cache.invalidate(bill.month_id)
+        return to_vo(BillVo, bill)
+
+    @staticmethod
+    async def bulk_update(db: AsyncSession, month_id: str, changes: BillBulkUpdateVo) -> list[BillVo]:
+        """
+        Applies changes to the bills of the month in a single UPDATE ... RETURNING
+        """
+        values = {}
+        if (changes.paid is not None):
+            values['paid'] = changes.paid
+            values['paid_at'] = _paid_at(changes.paid)
+        if (changes.shift_days):
+            # Due days stay within a month
+            values['day'] = func.greatest(1, func.least(31, Bill.day + changes.shift_days))
+        if (changes.amount_factor is not None):
+            values['amount'] = func.round(Bill.amount * changes.amount_factor, 2)
+
+        statement = update(Bill).where(Bill.month_id == month_id)
+        if (changes.ids is not None):
+            # One array parameter, so the statement is the same whatever the number of ids
+            ids = bindparam('ids', [UUID(bill_id) for bill_id in changes.ids], type_=ARRAY(PG_UUID(as_uuid=True)))
+            statement = statement.where(Bill.id == any_(ids))
+        rows = (await db.execute(statement.values(values).returning(*BILL_COLUMNS),
+                                 execution_options={'synchronize_session': False})).all()
+        await db.commit()
+        bill_cache.invalidate_tag(month_id)
+        month_cache.invalidate(month_id)
+        return to_vos(BillVo, rows)
+
+
+def _paid_at(paid: bool):
+    """
+    paid_at set in SQL: kept when an already paid bill is paid again, cleared when it is unpaid
+    """
+    return case((Bill.paid_at.is_(None), func.now()), else_=Bill.paid_at) if paid else None
@@ -0,0 +1,117 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from src.database.subscription import SubscriptionService
+from src.notifications.feed import BULK, channel_kind, parse_notification
+from src.settings.settings import app_settings
+
+
+class ReadCache:
+    """
+    Size bounded LRU cache with a TTL for the service lookups. Entries are invalidated by the notification
+    of their row; a value loaded while an invalidation arrived is not stored, so a stale entry is never
+    served once its change has been notified.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.entries: OrderedDict[Hashable, tuple[float, Any, Optional[str]]] = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        _ensure_listening()
+        entry = self.entries.get(key)
+        if (entry is None or entry[0] < time.monotonic()):
+            if (entry is not None):
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any, generation: int, tag: Optional[str] = None):
+        if (not app_settings.read_cache or generation != self.generation):
+            return
+        self.entries[key] = (time.monotonic() + app_settings.read_cache_ttl_seconds, value, tag)
+        self.entries.move_to_end(key)
+        while (len(self.entries) > app_settings.read_cache_size):
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self.generation += 1
+        if (self.entries.pop(key, None) is not None):
+            self.invalidations += 1
+
+    def invalidate_tag(self, tag: str):
+        self.generation += 1
+        for key in [key for key, entry in self.entries.items() if entry[2] == tag]:
+            del self.entries[key]
+            self.invalidations += 1
+
+    def clear(self):
+        self.generation += 1
+        self.entries.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+expense_cache = ReadCache('expenses')
+# Bills are tagged with their month, the month channel announces their changes too
+bill_cache = ReadCache('bills')
+month_cache = ReadCache('months')
+# Keyed by the versions of the months they cover, so they need no invalidation
+analytics_cache = ReadCache('analytics')
+
+_listening = False
+
+
+def _ensure_listening():
+    global _listening
+    if (_listening or not app_settings.read_cache):
+        return
+    _listening = True
+    SubscriptionService.tap(_on_notify, _clear)
+    # Bill channels are only seen while some client listens to them, the month channel covers the rest
+    SubscriptionService.subscribe('expenses', lambda payload: None)
+    SubscriptionService.subscribe('month', lambda payload: None)
+
+
+def _on_notify(channel: str, payload: str):
+    entity_id, change = parse_notification(payload)
+    if (change.action == BULK):
+        _on_bulk(channel)
+    elif (channel == 'expenses'):
+        expense_cache.invalidate(entity_id)
+    elif (channel == 'month'):
+        month_cache.invalidate(entity_id)
+        bill_cache.invalidate_tag(entity_id)
+    elif (channel_kind(channel) == 'bill'):
+        bill_cache.invalidate(entity_id)
+
+
+def _on_bulk(channel: str):
+    if (channel == 'expenses'):
+        expense_cache.clear()
+    elif (channel_kind(channel) == 'bill'):
+        bill_cache.invalidate_tag(channel.split('_', 1)[1])
+
+
+def _clear():
+    expense_cache.clear()
+    bill_cache.clear()
+    month_cache.clear()
+    analytics_cache.clear()
@@ -1,58 +1,94 @@
 from typing import List
 from uuid import UUID
 
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.errors.NotFoundError import NotFoundError
 from src.schemas.database import Expense
 from src.schemas.expense_vo import ExpenseRequestVo, ExpenseUpdateVo, ExpenseVo
+from src.services.cache import expense_cache
+from src.services.projection import projection, to_vo, to_vos
+
+# Page order, the id makes it unique for cursors
+EXPENSE_ORDER = (Expense.due_day, Expense.id)
+EXPENSE_COLUMNS = projection(Expense, ExpenseVo)
 
 
 class ExpenseService:
 
     @staticmethod
-    def get_all(db: Session, paginate, params) -> List[ExpenseVo]:
-        return paginate(db.query(Expense).order_by(Expense.due_day),
-                        params,
-                        transformer=lambda expenses: [ExpenseVo.model_validate(expense) for expense in expenses])
+    async def get_all(db: AsyncSession, paginate, params) -> List[ExpenseVo]:
+        return await paginate(db, select(*EXPENSE_COLUMNS),
+                              params,
+                              order=EXPENSE_ORDER,
+                              count_key=('expenses', None),
+                              transformer=lambda expenses: to_vos(ExpenseVo, expenses))
 
     @staticmethod
-    def get_all_active(db: Session) -> List[ExpenseVo]:
-        db_expenses = db.query(Expense).all()
-        return [ExpenseVo.model_validate(expense) for expense in db_expenses]
+    async def get_all_active(db: AsyncSession) -> List[ExpenseVo]:
+        return to_vos(ExpenseVo, (await db.execute(select(*EXPENSE_COLUMNS))).all())
 
     @staticmethod
-    def get_by_id(db: Session, expense_id: str) -> ExpenseVo | None:
+    async def get_by_id(db: AsyncSession, expense_id: str) -> ExpenseVo | None:
+        cached = expense_cache.get(expense_id.upper())
+        if (cached is not None):
+            return cached
+        generation = expense_cache.generation
         db_id = UUID(expense_id)
-        expense = db.query(Expense).filter(Expense.id == db_id).first()
-        return ExpenseVo.model_validate(expense)
+        row = (await db.execute(select(*EXPENSE_COLUMNS).where(Expense.id == db_id))).first()
+        if (row is None):
+            raise NotFoundError("Expense not found")
+        expense = to_vo(ExpenseVo, row)
+        expense_cache.put(expense.id, expense, generation)
+        return expense
 
     @staticmethod
-    def get_list_by_id(db: Session, expense_ids: List[str]) -> List[ExpenseVo] | None:
-        db_ids = [UUID(expense_id) for expense_id in expense_ids]
-        db_expenses = db.query(Expense).where(Expense.id.in_(db_ids)).all()
-        return [ExpenseVo.model_validate(expense) for expense in db_expenses]
+    async def get_list_by_id(db: AsyncSession, expense_ids: List[str]) -> List[ExpenseVo] | None:
+        expenses = [expense for expense in (expense_cache.get(expense_id.upper()) for expense_id in expense_ids)
+                    if expense is not None]
+        missing = {expense_id.upper() for expense_id in expense_ids} - {expense.id for expense in expenses}
+        if (not missing):
+            return expenses
+        generation = expense_cache.generation
+        db_ids = [UUID(expense_id) for expense_id in missing]
+        db_expenses = (await db.execute(select(*EXPENSE_COLUMNS).where(Expense.id.in_(db_ids)))).all()
+        for expense in to_vos(ExpenseVo, db_expenses):
+            expense_cache.put(expense.id, expense, generation)
+            expenses.append(expense)
+        return expenses
 
     @staticmethod
-    def create(db: Session, expense: ExpenseRequestVo) -> ExpenseVo:
+    async def create(db: AsyncSession, expense: ExpenseRequestVo) -> ExpenseVo:
         db_expense = Expense(**expense.model_dump())
         db.add(db_expense)
-        db.commit()
-        db.refresh(db_expense)
+        await db.commit()
+        await db.refresh(db_expense)
         return ExpenseVo.model_validate(db_expense)
 
     @staticmethod
-    def update(db: Session, expense_id: str, expense: ExpenseUpdateVo):
+    async def update(db: AsyncSession, expense_id: str, expense: ExpenseUpdateVo):
         db_id = UUID(expense_id)
-        current_expense = db.query(Expense).filter(Expense.id == db_id).first()
-        for key, value in expense.model_dump(exclude_unset=True).items():
-            setattr(current_expense, key, value)
-        db.commit()
-        return ExpenseVo.model_validate(current_expense)
+        values = expense.model_dump(exclude_unset=True)
+        if (not values):
+            return await ExpenseService.get_by_id(db, expense_id)
+        updated_expense = (await db.execute(update(Expense)
+                                            .where(Expense.id == db_id)
+                                            .values(values)
+                                            .returning(*EXPENSE_COLUMNS),
+                                            execution_options={'synchronize_session': False})).first()
+        if (updated_expense is None):
+            raise NotFoundError("Expense not found")
+        await db.commit()
+        expense_cache.invalidate(expense_id.upper())
+        return to_vo(ExpenseVo, updated_expense)
 
     @staticmethod
-    def delete(db: Session, expense_id: str):
+    async def delete(db: AsyncSession, expense_id: str):
         db_id = UUID(expense_id)
-        expense = db.query(Expense).filter(Expense.id == db_id).first()
-        db.delete(expense)
-        db.commit()
-        db.flush()
+        deleted = await db.scalar(delete(Expense).where(Expense.id == db_id).returning(Expense.id),
+                                  execution_options={'synchronize_session': False})
+        if (deleted is None):
+            raise NotFoundError("Expense not found")
+        await db.commit()
+        expense_cache.invalidate(expense_id.upper())
@@ -0,0 +1,101 @@
+import csv
+import io
+import zlib
+from typing import AsyncIterator, NamedTuple, Optional, Sequence, Type
+
+from pydantic import BaseModel
+from sqlalchemy import Label, select
+from sqlalchemy.orm import InstrumentedAttribute
+
+from src.database.db import fetch_async_connection
+from src.errors.UserError import UserError
+from src.schemas.bill_vo import BillVo
+from src.schemas.database import Bill, Income, MonthDetails
+from src.schemas.expense_vo import ExpenseVo
+from src.schemas.export_vo import ExportFormat, ExportKind
+from src.schemas.income_vo import IncomeVo
+from src.schemas.month_vo import MonthDetailsVo
+from src.services.bill_service import BILL_COLUMNS, BILL_ORDER
+from src.services.expenses_service import EXPENSE_COLUMNS, EXPENSE_ORDER
+from src.services.income_service import INCOME_COLUMNS, INCOME_ORDER
+from src.services.month_service import MONTH_COLUMNS
+
+# Rows fetched from the server side cursor at a time, each batch is encoded and sent as one chunk
+EXPORT_BATCH_SIZE = 1000
+
+
+class _Export(NamedTuple):
+    vo: Type[BaseModel]
+    columns: list[Label]
+    order: Sequence[InstrumentedAttribute]
+    month: Optional[InstrumentedAttribute]
+
+
+EXPORTS = {
+    ExportKind.expenses: _Export(ExpenseVo, EXPENSE_COLUMNS, EXPENSE_ORDER, None),
+    ExportKind.bills: _Export(BillVo, BILL_COLUMNS, BILL_ORDER, Bill.month_id),
+    ExportKind.income: _Export(IncomeVo, INCOME_COLUMNS, INCOME_ORDER, Income.month_id),
+    ExportKind.months: _Export(MonthDetailsVo, MONTH_COLUMNS, (MonthDetails.id,), None),
+}
+
+
+class ExportService:
+
+    @staticmethod
+    def query(kind: ExportKind, month_id: Optional[str] = None):
+        spec = EXPORTS[kind]
+        query = select(*spec.columns).order_by(*spec.order)
+        if (month_id is not None):
+            if (spec.month is None):
+                raise UserError(f"{kind.value} can't be filtered by month")
+            query = query.where(spec.month == month_id)
+        return query
+
+    @staticmethod
+    async def stream(kind: ExportKind, export_format: ExportFormat, month_id: Optional[str] = None,
+                     gzip: bool = False) -> AsyncIterator[bytes]:
+        """
+        Encodes every row of kind while it is read from a server side cursor, one batch at a time.
+        Runs on its own session, the request's is closed before a streamed body is sent.
+        """
+        spec = EXPORTS[kind]
+        query = ExportService.query(kind, month_id)
+        compressor = zlib.compressobj(wbits=31) if (gzip) else None
+        encode = _encode_csv if (export_format == ExportFormat.csv) else _encode_ndjson
+
+        if (export_format == ExportFormat.csv):
+            yield _compress(compressor, _csv_lines([list(spec.vo.model_fields)]))
+        async with fetch_async_connection() as db:
+            result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield _compress(compressor, encode([spec.vo.model_validate(row._asdict()) for row in rows]))
+        if (compressor is not None):
+            yield compressor.flush()
+
+
+def _compress(compressor, chunk: bytes) -> bytes:
+    if (compressor is None):
+        return chunk
+    # Flushed at every batch, so the client gets each batch as soon as it is encoded
+    return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def _encode_ndjson(vos: list[BaseModel]) -> bytes:
+    return b''.join(vo.model_dump_json(exclude_none=True).encode('utf-8') + b'\n' for vo in vos)
+
+
+def _encode_csv(vos: list[BaseModel]) -> bytes:
+    return _csv_lines([[_csv_value(value) for value in vo.model_dump(mode='json').values()] for vo in vos])
+
+
+def _csv_value(value):
+    # Booleans as in JSON, which is also what the import reads
+    if (isinstance(value, bool)):
+        return 'true' if value else 'false'
+    return value
+
+
+def _csv_lines(rows: list[list]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode('utf-8')
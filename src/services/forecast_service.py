@@ -0,0 +1,138 @@
+from datetime import date
+from decimal import Decimal
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import BigInteger, Date, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.errors.UserError import UserError
+from src.schemas.database import Expense, Month, MonthDetails, gen_month_key
+from src.schemas.forecast_vo import ForecastGranularity, ForecastOverrideVo, ForecastPointVo, ForecastRequest
+from src.services.analytics_service import EXPENSE, INCOME
+
+# Months averaged for the default income
+RECENT_INCOME_MONTHS = 3
+
+# Amounts are projected in cents, so sums stay exact
+EXPENSE_TERMS = (Expense.id, Expense.due_day, cast(func.round(Expense.amount * 100), BigInteger), Expense.active,
+                 cast(Expense.active_until, Date))
+
+
+class ForecastService:
+
+    @staticmethod
+    async def forecast(db: AsyncSession, spec: ForecastRequest) -> tuple[list[ForecastPointVo], dict]:
+        """
+        Projects the balance from the expenses, with the overrides of spec applied, and the monthly income.
+        Returns the points and the figures the projection started from
+        """
+        if (spec.start_year is not None):
+            start_year, start_month = spec.start_year, spec.start_month
+        else:
+            start_year, start_month = await _next_month(db)
+        start_key = gen_month_key(start_year, start_month)
+
+        history = select(func.coalesce(func.sum(INCOME - EXPENSE), 0)) \
+            .where(MonthDetails.id < start_key) \
+            .scalar_subquery()
+        recent = select(MonthDetails.total_income) \
+            .where(MonthDetails.id < start_key, MonthDetails.total_income.is_not(None)) \
+            .order_by(MonthDetails.id.desc()) \
+            .limit(RECENT_INCOME_MONTHS) \
+            .subquery()
+        recent_income = select(func.coalesce(func.avg(recent.c.total_income), 0)).scalar_subquery()
+        balance, income = (await db.execute(select(history, recent_income))).one()
+        if (spec.starting_balance is not None):
+            balance = spec.starting_balance
+        if (spec.income is not None):
+            income = spec.income
+
+        expenses = _expense_columns((await db.execute(select(*EXPENSE_TERMS))).all(), spec.overrides)
+        dates, incomes, charges, balances = project(np.datetime64(f"{start_year}-{start_month:02d}", 'M'),
+                                                    spec.months, spec.granularity, *expenses,
+                                                    _cents(income), _cents(balance))
+        points = [ForecastPointVo(date=day, income=_amount(credit), expense=_amount(debit), balance=_amount(total))
+                  for day, credit, debit, total in zip(dates.tolist(), incomes.tolist(), charges.tolist(),
+                                                       balances.tolist())]
+        meta = {'start': start_key, 'starting_balance': _amount(_cents(balance)), 'income': _amount(_cents(income)),
+                'active_expenses': int(expenses[2].sum())}
+        return points, meta
+
+
+def project(start: np.datetime64, months: int, granularity: ForecastGranularity, due_days: np.ndarray,
+            amounts: np.ndarray, active: np.ndarray, until: np.ndarray, income: int, balance: int) \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Projects the expenses (one array element each, amounts in cents, until as NaT when they don't end) over the
+    months from start, every month charged on its due day (clamped to the days of the month) and credited the income
+    on its first day. Returns the dates with their income, expense and closing balance, per day or per month
+    """
+    month_starts = start + np.arange(months)
+    first_days = month_starts.astype('datetime64[D]')
+    month_days = ((month_starts + 1).astype('datetime64[D]') - first_days).astype(np.int64)
+    # One row per month, one column per expense
+    due = first_days[:, None] + (np.clip(due_days[None, :], 1, month_days[:, None]) - 1).astype('timedelta64[D]')
+    charged = active[None, :] & ~(due > until[None, :])
+    charges = np.where(charged, amounts[None, :], 0)
+
+    if (granularity == ForecastGranularity.month):
+        debits = charges.sum(axis=1)
+        credits = np.full(months, income, dtype=np.int64)
+        return first_days, credits, debits, balance + np.cumsum(credits - debits)
+
+    days = np.arange(first_days[0], (month_starts[-1] + 1).astype('datetime64[D]'))
+    offsets = (due - first_days[0]).astype(np.int64).ravel()
+    debits = np.bincount(offsets, weights=charges.ravel(), minlength=len(days)).round().astype(np.int64)
+    credits = np.zeros(len(days), dtype=np.int64)
+    credits[(first_days - first_days[0]).astype(np.int64)] = income
+    return days, credits, debits, balance + np.cumsum(credits - debits)
+
+
+def _expense_columns(rows, overrides: list[ForecastOverrideVo]) \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Columns of due days, amounts in cents, active flags and end dates of the expenses with the overrides applied
+    """
+    ids, due_days, amounts, active, until = (list(column) for column in zip(*rows)) if rows else ([], [], [], [], [])
+    positions = {expense_id: index for index, expense_id in enumerate(ids)}
+    for override in overrides:
+        if (override.expense_id is None):
+            index = len(ids)
+            ids.append(None)
+            due_days.append(None)
+            amounts.append(None)
+            active.append(True)
+            until.append(None)
+        else:
+            index = positions.get(UUID(override.expense_id))
+            if (index is None):
+                raise UserError(f"Expense {override.expense_id} not found")
+        values = override.model_dump(exclude_unset=True, exclude={'expense_id'})
+        if ('due_day' in values):
+            due_days[index] = values['due_day']
+        if ('amount' in values):
+            amounts[index] = _cents(values['amount'])
+        if ('active' in values):
+            active[index] = values['active']
+        if ('active_until' in values):
+            until[index] = values['active_until'] and values['active_until'].date()
+    return (np.array(due_days, dtype=np.int64), np.array(amounts, dtype=np.int64), np.array(active, dtype=bool),
+            np.array(until, dtype='datetime64[D]'))
+
+
+async def _next_month(db: AsyncSession) -> tuple[int, int]:
+    last = await db.scalar(select(func.max(Month.id)))
+    if (last is None):
+        today = date.today()
+        return today.year, today.month
+    year, month = (int(part) for part in last.split('_'))
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _cents(amount) -> int:
+    return int((Decimal(amount) * 100).quantize(Decimal(1)))
+
+
+def _amount(cents: int) -> Decimal:
+    return Decimal(cents).scaleb(-2)
@@ -0,0 +1,183 @@
+import csv
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, NamedTuple, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.errors.UserError import UserError
+from src.schemas.expense_vo import ExpenseRequestVo
+from src.schemas.import_vo import BillImportVo, ImportKind, ImportResultVo, IncomeImportVo
+
+
+class _Import(NamedTuple):
+    vo: Type[BaseModel]
+    # Staging table columns, filled by record from each validated row. The statements get the table name
+    staging: str
+    record: Callable[[Any], tuple]
+    # Merges the staging table, returning the row count
+    merge: str
+    # Announces the import on every channel it changed, when the row notifications are off
+    announce: str
+    monthly: bool
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps are stored without time zone, in UTC
+    if (value is None or value.tzinfo is None):
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _month_of(month_id: str) -> tuple[int, int]:
+    return int(month_id[:4]), int(month_id[5:])
+
+
+ANNOUNCE_MONTHS = """
+    SELECT pg_notify('month', concat_ws(' ', 'add', month_id)) FROM (SELECT DISTINCT month_id FROM {table}) months
+"""
+
+# Listeners of a bill channel get a "bulk" notification, telling them to reload the month's bills
+ANNOUNCE_BILLS = ANNOUNCE_MONTHS + """
+    UNION ALL
+    SELECT pg_notify(concat_ws('_', 'bill', month_id), 'bulk') FROM (SELECT DISTINCT month_id FROM {table}) months
+"""
+
+IMPORTS = {
+    ImportKind.expenses: _Import(
+        vo=ExpenseRequestVo,
+        staging="name VARCHAR, due_day INTEGER, amount NUMERIC, active BOOLEAN, active_until TIMESTAMP",
+        record=lambda expense: (expense.name, expense.due_day, expense.amount, expense.active,
+                                _timestamp(expense.active_until)),
+        merge="""
+            WITH inserted AS (
+                INSERT INTO expenses (name, due_day, amount, active, active_until)
+                SELECT name, due_day, amount, active, active_until FROM {table}
+                RETURNING id
+            )
+            SELECT count(*) FROM inserted
+        """,
+        announce="SELECT pg_notify('expenses', 'bulk')",
+        monthly=False,
+    ),
+    ImportKind.bills: _Import(
+        vo=BillImportVo,
+        staging="month_id VARCHAR, year INTEGER, month INTEGER, name VARCHAR, day INTEGER, amount NUMERIC, "
+                "paid BOOLEAN",
+        record=lambda bill: (bill.month_id, *_month_of(bill.month_id), bill.name, bill.day, bill.amount,
+                             bool(bill.paid)),
+        merge="""
+            WITH inserted AS (
+                INSERT INTO bills (name, month_id, day, amount, paid, paid_at)
+                SELECT name, month_id, day, amount, paid, CASE WHEN paid THEN now() END FROM {table}
+                RETURNING id
+            )
+            SELECT count(*) FROM inserted
+        """,
+        announce=ANNOUNCE_BILLS,
+        monthly=True,
+    ),
+    ImportKind.income: _Import(
+        vo=IncomeImportVo,
+        staging="month_id VARCHAR, year INTEGER, month INTEGER, name VARCHAR, amount NUMERIC",
+        record=lambda income: (income.month_id, *_month_of(income.month_id), income.name, income.amount),
+        merge="""
+            WITH inserted AS (
+                INSERT INTO income (name, month_id, amount)
+                SELECT name, month_id, amount FROM {table}
+                RETURNING id
+            )
+            SELECT count(*) FROM inserted
+        """,
+        announce=ANNOUNCE_MONTHS,
+        monthly=True,
+    ),
+}
+
+CREATE_MONTHS = """
+    WITH created AS (
+        INSERT INTO months (year, month)
+        SELECT DISTINCT year, month FROM {table}
+        ON CONFLICT DO NOTHING
+        RETURNING slug
+    )
+    SELECT count(*) FROM created
+"""
+
+
+class ImportService:
+
+    @staticmethod
+    async def import_csv(db: AsyncSession, kind: ImportKind, lines: AsyncIterator[str],
+                         notify: bool = False) -> ImportResultVo:
+        """
+        Imports CSV lines, a header and then one row per line, in one transaction. The rows are validated
+        while they are streamed with COPY into a staging table, which is then merged into the real tables.
+        Without notify the row notifications are off, each changed channel gets one notification instead.
+        """
+        spec = IMPORTS[kind]
+        # One staging table per kind, asyncpg caches the column types of a COPY target by its name
+        table = f"import_{kind.value}"
+        await db.execute(text(f"CREATE TEMP TABLE {table} ({spec.staging}) ON COMMIT DROP"))
+        if (not notify):
+            await db.execute(text("SET LOCAL financer.notify = 'off'"))
+
+        # COPY runs on the session's own asyncpg connection, inside its transaction
+        connection = (await (await db.connection()).get_raw_connection()).driver_connection
+        await connection.copy_records_to_table(table, records=_records(lines, spec.vo, spec.record))
+
+        months_created = await db.scalar(text(CREATE_MONTHS.format(table=table))) if (spec.monthly) else 0
+        rows = await db.scalar(text(spec.merge.format(table=table)))
+        if (not notify and rows):
+            await db.execute(text(spec.announce.format(table=table)))
+        await db.commit()
+        return ImportResultVo(kind=kind, rows=rows, months_created=months_created)
+
+
+async def lines_of(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Splits a stream of bytes in lines, holding at most one chunk and one line in memory
+    """
+    pending = b''
+    async for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8-sig').rstrip('\r')
+    if (pending):
+        yield pending.decode('utf-8-sig').rstrip('\r')
+
+
+async def _records(lines: AsyncIterator[str], vo: Type[BaseModel], record: Callable[[Any], tuple]):
+    header = None
+    line_number = 0
+    # A record spans several lines when a quoted field holds line breaks, errors point at its first line
+    record_line = 0
+    pending = None
+    async for line in lines:
+        line_number += 1
+        if (pending is not None):
+            line = pending + '\n' + line
+        elif (not line.strip()):
+            continue
+        else:
+            record_line = line_number
+        if (line.count('"') % 2):
+            pending = line
+            continue
+        pending = None
+        try:
+            values = next(csv.reader([line]))
+        except csv.Error as e:
+            raise UserError(f"Line {record_line}: {e}", e)
+        if (header is None):
+            header = [column.strip() for column in values]
+            continue
+        try:
+            row = vo.model_validate({column: value for column, value in zip(header, values) if value != ''})
+        except ValidationError as e:
+            error = e.errors()[0]
+            raise UserError(f"Line {record_line}: {'.'.join(map(str, error['loc']))} {error['msg']}", e)
+        yield record(row)
+    if (pending is not None):
+        raise UserError(f"Line {record_line}: unterminated quoted field")
@@ -1,50 +1,65 @@
 from uuid import UUID
 
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.errors.NotFoundError import NotFoundError
 from src.schemas.database import Income
 from src.schemas.income_vo import IncomeUpdateVo, IncomeVo
+from src.services.cache import month_cache
+from src.services.projection import projection, to_vo, to_vos
 
+# Page order, the id makes it unique for cursors
+INCOME_ORDER = (Income.amount, Income.id)
+INCOME_COLUMNS = projection(Income, IncomeVo)
 
-class IncomeService:
 
-    #  Todo create vo
-    @staticmethod
-    def create(db: Session, income: Income) -> IncomeVo:
-        db.add(income)
-        db.commit()
-        db.refresh(income)
-        return IncomeVo.model_validate(income)
+class IncomeService:
 
     @staticmethod
-    def get_by_month(db: Session, month_id: int):
-        return db.query(Income).filter(Income.month_id == month_id).all()
+    async def get_by_month(db: AsyncSession, month_id: str) -> list[IncomeVo]:
+        return to_vos(IncomeVo, (await db.execute(select(*INCOME_COLUMNS).where(Income.month_id == month_id))).all())
 
     @staticmethod
-    def get_all_paginated(db: Session, paginate, params):
-        return paginate(db.query(Income).order_by(Income.amount),
-                        params,
-                        transformer=lambda incomes: [IncomeVo.model_validate(income) for income in incomes])
+    async def get_all_paginated(db: AsyncSession, paginate, params):
+        return await paginate(db, select(*INCOME_COLUMNS),
+                              params,
+                              order=INCOME_ORDER,
+                              count_key=('income', None),
+                              transformer=lambda incomes: to_vos(IncomeVo, incomes))
 
     @staticmethod
-    def get_paginated_by_month(db: Session, month_id: str, paginate, params):
-        return paginate(db.query(Income).filter(Income.month_id == month_id).order_by(Income.amount),
-                        params,
-                        transformer=lambda incomes: [IncomeVo.model_validate(income) for income in incomes])
+    async def get_paginated_by_month(db: AsyncSession, month_id: str, paginate, params):
+        return await paginate(db, select(*INCOME_COLUMNS).where(Income.month_id == month_id),
+                              params,
+                              order=INCOME_ORDER,
+                              count_key=('income', month_id),
+                              transformer=lambda incomes: to_vos(IncomeVo, incomes))
 
     @staticmethod
-    def delete(db: Session, id: str) -> None:
+    async def delete(db: AsyncSession, id: str) -> None:
         db_id = UUID(id)
-        to_be_deleted = db.query(Income).filter(Income.id == db_id).first()
-        db.delete(to_be_deleted)
-        db.flush()
+        month_id = await db.scalar(delete(Income).where(Income.id == db_id).returning(Income.month_id),
+                                   execution_options={'synchronize_session': False})
+        if (month_id is None):
+            raise NotFoundError("Income not found")
+        await db.commit()
+        month_cache.invalidate(month_id)
 
     @staticmethod
-    def update(db: Session, bill_id: str, updated_income: IncomeUpdateVo) -> IncomeVo:
-        db_id = UUID(bill_id)
-        current_income = db.query(Income).filter(Income.id == db_id).first()
-        for key, value in updated_income.model_dump(exclude_unset=True).items():
-            setattr(current_income, key, value)
-        db.commit()
-        db.refresh(current_income)
-        return IncomeVo.model_validate(current_income)
+    async def update(db: AsyncSession, income_id: str, updated_income: IncomeUpdateVo) -> IncomeVo:
+        db_id = UUID(income_id)
+        values = updated_income.model_dump(exclude_unset=True)
+        if (not values):
+            income = (await db.execute(select(*INCOME_COLUMNS).where(Income.id == db_id))).first()
+        else:
+            income = (await db.execute(update(Income)
+                                       .where(Income.id == db_id)
+                                       .values(values)
+                                       .returning(*INCOME_COLUMNS),
+                                       execution_options={'synchronize_session': False})).first()
+        if (income is None):
+            raise NotFoundError("Income not found")
+        await db.commit()
+        month_cache.invalidate(income.month_id)
+        return to_vo(IncomeVo, income)
@@ -1,66 +1,148 @@
+from uuid import UUID
+
 import sqlalchemy
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, false, insert, literal, select, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.errors.NotFoundError import NotFoundError
 from src.errors.UserError import UserError
-from src.schemas.database import Bill, Income, Month, MonthDetails
-from src.schemas.month_vo import MonthCreateRequest, MonthDetailsVo
-from src.services.bill_service import BillService
-from src.services.expenses_service import ExpenseService
-from src.services.income_service import IncomeService
+from src.schemas.database import Bill, Expense, Income, Month, MonthDetails, gen_month_key
+from src.schemas.month_vo import MonthBatchCreateRequest, MonthCreateRequest, MonthDetailsVo
+from src.services.cache import bill_cache, month_cache
+from src.services.projection import projection, to_vo, to_vos
+
+MONTH_COLUMNS = projection(MonthDetails, MonthDetailsVo)
 
 
 class MonthService:
     @staticmethod
-    def create(month_spec: MonthCreateRequest, db: Session):
+    async def create(month_spec: MonthCreateRequest, db: AsyncSession):
+        """
+        Creates the month with its bills and income in one transaction, the bills are copied from the
+        expenses by the database
+        """
         try:
-            month = Month(year=month_spec.year, month=month_spec.month)
-            month = MonthService.save(month, db)
+            month_id = await db.scalar(insert(Month)
+                                       .values(year=month_spec.year, month=month_spec.month)
+                                       .returning(Month.id))
         except sqlalchemy.exc.IntegrityError as e:
+            await db.rollback()
             raise UserError("Month already exists", e)
 
-        expenses = ExpenseService.get_list_by_id(db, month_spec.expenses)
-
-        bills = [Bill(
-            name=expense.name,
-            month_id=month.id,
-            day=expense.due_day,
-            amount=expense.amount,
-            paid=False
-        ) for expense in expenses]
-        BillService.save_all(db, bills)
+        expense_ids = [UUID(expense_id) for expense_id in month_spec.expenses]
+        bills = select(Expense.name, literal(month_id), Expense.due_day, Expense.amount, false()) \
+            .where(Expense.id.in_(expense_ids))
+        # Without the python side defaults, so every bill gets its id from the database
+        await db.execute(insert(Bill)
+                         .from_select([Bill.name, Bill.month_id, Bill.day, Bill.amount, Bill.paid], bills,
+                                      include_defaults=False))
 
         if (month_spec.income_value):
-            income = Income(name='Salary', month_id=month.id, amount=month_spec.income_value)
-            IncomeService.create(db, income)
+            await db.execute(insert(Income).values(name='Salary', month_id=month_id, amount=month_spec.income_value))
 
-        return MonthService.get_details(month.id, db)
+        month = (await db.execute(select(*MONTH_COLUMNS).where(MonthDetails.id == month_id))).one()
+        await db.commit()
+        return to_vo(MonthDetailsVo, month)
 
     @staticmethod
-    def delete(month_id: str, db: Session):
-        month = db.query(Month).filter(Month.id == month_id).first()
-        if not month:
-            raise UserError("Month not found")
+    async def create_batch(batch_spec: MonthBatchCreateRequest, db: AsyncSession) \
+            -> tuple[list[MonthDetailsVo], list[str]]:
+        """
+        Creates every month of the range that does not exist yet, with their bills and income, in one transaction.
+        Returns the created months and the slugs of the ones that already existed
+        """
+        new_months = [{'year': year, 'month': month} for year, month in batch_spec.months()]
+        created = set((await db.scalars(pg_insert(Month)
+                                         .values(new_months)
+                                         .on_conflict_do_nothing()
+                                         .returning(Month.id))).all())
+        existing = [gen_month_key(year, month) for year, month in batch_spec.months()
+                    if gen_month_key(year, month) not in created]
+        if (not created):
+            await db.commit()
+            return [], existing
+
+        expense_ids = [UUID(expense_id) for expense_id in batch_spec.expenses]
+        bills = select(Expense.name, Month.id, Expense.due_day, Expense.amount, false()) \
+            .select_from(Expense) \
+            .join(Month, true()) \
+            .where(Expense.id.in_(expense_ids), Month.id.in_(created))
+        await db.execute(insert(Bill)
+                         .from_select([Bill.name, Bill.month_id, Bill.day, Bill.amount, Bill.paid], bills,
+                                      include_defaults=False))
+
+        if (batch_spec.income_value):
+            income = select(literal('Salary'), Month.id, literal(batch_spec.income_value)) \
+                .where(Month.id.in_(created))
+            await db.execute(insert(Income)
+                             .from_select([Income.name, Income.month_id, Income.amount], income,
+                                          include_defaults=False))
 
-        db.delete(month)
-        db.commit()
-        return month
+        months = (await db.execute(select(*MONTH_COLUMNS)
+                                   .where(MonthDetails.id.in_(created))
+                                   .order_by(MonthDetails.id))).all()
+        await db.commit()
+        return to_vos(MonthDetailsVo, months), existing
 
     @staticmethod
-    def get_all(db: Session, paginate, params):
-        return paginate(db.query(MonthDetails).order_by(MonthDetails.id.desc()),
-                        params,
-                        transformer=lambda months: [MonthDetailsVo.model_validate(month) for month in months])
+    async def delete(month_id: str, db: AsyncSession):
+        deleted = await db.scalar(delete(Month).where(Month.id == month_id).returning(Month.id),
+                                  execution_options={'synchronize_session': False})
+        if (deleted is None):
+            raise NotFoundError("Month not found")
+        await db.commit()
+        month_cache.invalidate(month_id)
+        bill_cache.invalidate_tag(month_id)
+        return deleted
 
     @staticmethod
-    def save(month: Month, db: Session):
-        db.add(month)
-        db.commit()
-        db.refresh(month)
-        return month
+    async def get_all(db: AsyncSession, paginate, params):
+        return await paginate(db, select(*MONTH_COLUMNS),
+                              params,
+                              order=(MonthDetails.id,),
+                              descending=True,
+                              count_key=('months', None),
+                              transformer=lambda months: to_vos(MonthDetailsVo, months))
 
     @staticmethod
-    def get_details(month_id: str, db: Session) -> MonthDetailsVo:
-        month = db.query(MonthDetails).filter(MonthDetails.id == month_id).first()
+    async def get_details(month_id: str, db: AsyncSession) -> MonthDetailsVo:
+        month_details, _ = await MonthService.get_versioned_details(month_id, db)
+        return month_details
+
+    @staticmethod
+    async def get_versioned_details(month_id: str, db: AsyncSession) -> tuple[MonthDetailsVo, int]:
+        """
+        Details of the month with the version they were read at, cached together so a cached body is never
+        tagged with a newer version
+        """
+        cached = month_cache.get(month_id)
+        if (cached is not None):
+            return cached
+        generation = month_cache.generation
+        month = (await db.execute(select(*MONTH_COLUMNS, MonthDetails.version)
+                                  .where(MonthDetails.id == month_id))).first()
         if not month:
-            raise UserError("Month not found")
-        return MonthDetailsVo.model_validate(month)
+            raise NotFoundError("Month not found")
+        versioned = (to_vo(MonthDetailsVo, month), month.version)
+        month_cache.put(month_id, versioned, generation)
+        return versioned
+
+    @staticmethod
+    async def get_version(month_id: str, db: AsyncSession) -> int | None:
+        return await db.scalar(select(MonthDetails.version).where(MonthDetails.id == month_id))
+
+    @staticmethod
+    async def get_details_list(month_ids: list[str], db: AsyncSession) -> list[MonthDetailsVo]:
+        months = [cached[0] for cached in (month_cache.get(month_id) for month_id in month_ids) if cached is not None]
+        missing = set(month_ids) - {month.id for month in months}
+        if (not missing):
+            return months
+        generation = month_cache.generation
+        db_months = (await db.execute(select(*MONTH_COLUMNS, MonthDetails.version)
+                                      .where(MonthDetails.id.in_(missing)))).all()
+        for db_month in db_months:
+            month = to_vo(MonthDetailsVo, db_month)
+            month_cache.put(month.id, (month, db_month.version), generation)
+            months.append(month)
+        return months
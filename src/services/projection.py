@@ -0,0 +1,23 @@
+from typing import Any, Sequence, Type, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import Label, Row
+
+from src.database.db import Base
+
+V = TypeVar("V", bound=BaseModel)
+
+
+def projection(model: Type[Base], vo: Type[BaseModel]) -> list[Label]:
+    """
+    Columns of model read by vo, labelled with the vo field names so rows can be validated without ORM objects
+    """
+    return [getattr(model, name).label(name) for name in vo.model_fields if hasattr(model, name)]
+
+
+def to_vo(vo: Type[V], row: Row[Any]) -> V:
+    return vo.model_validate(row._asdict())
+
+
+def to_vos(vo: Type[V], rows: Sequence[Row[Any]]) -> list[V]:
+    return [vo.model_validate(row._asdict()) for row in rows]
@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic import computed_field
 from pydantic_settings import BaseSettings
 
@@ -7,11 +9,42 @@ class Settings(BaseSettings):
     pg_password: str
     pg_host: str
     pg_db_name: str
+    # Connection pool of each engine, see sqlalchemy.create_engine
+    pg_pool_size: int = 5
+    pg_max_overflow: int = 10
+    pg_pool_timeout: float = 30
+    pg_pool_recycle: int = -1
+    pg_pool_pre_ping: bool = False
+    # Debounce window for notifications, optionally overridden per channel kind (expenses, month, bill)
+    notify_debounce_ms: int = 50
+    notify_debounce_ms_by_channel: dict[str, int] = {}
+    # Unix socket of the host's notification relay; when set, notifications come through it instead of a LISTEN
+    # connection of this process (set by main.py when it runs several workers)
+    notify_relay_socket: Optional[str] = None
+    # Frames buffered per websocket subscriber, and what happens when a slow one fills its buffer (drop_oldest,
+    # collapse or disconnect); clients may pick the policy with ?policy=
+    notify_buffer_size: int = 1000
+    notify_slow_consumer_policy: Literal['drop_oldest', 'collapse', 'disconnect'] = 'drop_oldest'
+    # Latest frames kept per channel for clients resuming with ?since=<seq>, and how long a channel nobody
+    # listens to anymore is kept for them
+    notify_replay_size: int = 1000
+    notify_replay_retention_seconds: float = 300
+    # Cache exact list totals, invalidated by the expenses and month notifications
+    page_count_cache: bool = False
+    # In-process LRU cache of service lookups, invalidated by notifications
+    read_cache: bool = True
+    read_cache_size: int = 4096
+    read_cache_ttl_seconds: float = 300
 
     @computed_field
     @property
     def pg_connect_string(self) -> str:
         return f"postgresql://{self.pg_user}:{self.pg_password}@{self.pg_host}/{self.pg_db_name}"
 
+    @computed_field
+    @property
+    def pg_async_connect_string(self) -> str:
+        return f"postgresql+asyncpg://{self.pg_user}:{self.pg_password}@{self.pg_host}/{self.pg_db_name}"
+
 
 app_settings = Settings(_env_file='.env')
@@ -0,0 +1,117 @@
+"""
+The tests run against the Postgres database of the settings (PG_* environment variables), migrated with the files
+of schema/. Its tables are truncated before every test, so point it at a disposable database.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+import psycopg2
+import pytest
+from fastapi.testclient import TestClient
+
+from src.settings.settings import app_settings
+
+TABLES = ('bills', 'income', 'month_summary', 'months', 'expenses')
+
+
+def connect():
+    return psycopg2.connect(host=app_settings.pg_host, dbname=app_settings.pg_db_name, user=app_settings.pg_user,
+                            password=app_settings.pg_password)
+
+
+def execute(connection, statement: str, *params):
+    with connection.cursor() as cursor:
+        cursor.execute(statement, params)
+        return cursor.fetchall() if cursor.description else None
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not met in time'
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def sql():
+    """
+    Autocommit connection of its own, for changes made behind the back of the API
+    """
+    try:
+        connection = connect()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'Database not available: {e}')
+    connection.autocommit = True
+    execute(connection, f'TRUNCATE {", ".join(TABLES)}')
+    yield connection
+    connection.close()
+
+
+@pytest.fixture(scope='session')
+def app_client():
+    # One client, and so one event loop, for the session: the notification listener stays bound to it
+    import main
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def client(app_client, sql):
+    from src.services.cache import analytics_cache, bill_cache, expense_cache, month_cache
+    for cache in (expense_cache, bill_cache, month_cache, analytics_cache):
+        cache.clear()
+    close_retained_feeds()
+    return app_client
+
+
+@pytest.fixture
+def month(client) -> dict:
+    """
+    Month 2030_01 created from a 10.00 expense with an income of 100, with the ids of its rows
+    """
+    expense_id = client.post('/expenses/', json={'name': 'rent', 'due_day': 5, 'amount': 10}).json()['data']['id']
+    client.post('/month/create', json={'year': 2030, 'month': 1, 'expenses': [expense_id], 'income_value': 100})
+    return {
+        'id': '2030_01',
+        'expense': expense_id,
+        'bill': client.get('/bill/2030_01').json()['data'][0]['id'],
+        'income': client.get('/income/2030_01').json()['data'][0]['id'],
+    }
+
+
+def close_retained_feeds():
+    """
+    Feeds left by the websockets of earlier tests would otherwise keep answering notifications
+    """
+    from src.database.subscription import listener
+    from src.notifications.feed import FEEDS
+
+    async def close():
+        for feed in [feed for feed in FEEDS.values() if not feed.buffers]:
+            feed.close()
+
+    if (listener.loop is not None):
+        asyncio.run_coroutine_threadsafe(close(), listener.loop).result()
+
+
+@contextmanager
+def listener_paused():
+    """
+    Notifications are left unread on the listener connection until the block is done
+    """
+    from src.database.subscription import listener
+
+    async def remove_reader():
+        listener.loop.remove_reader(listener.reader_fd)
+
+    async def add_reader():
+        listener.loop.add_reader(listener.reader_fd, listener._handle_notify)
+        listener._handle_notify()
+
+    asyncio.run_coroutine_threadsafe(remove_reader(), listener.loop).result()
+    try:
+        yield
+    finally:
+        asyncio.run_coroutine_threadsafe(add_reader(), listener.loop).result()
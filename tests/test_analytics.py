@@ -0,0 +1,19 @@
+from src.services.cache import analytics_cache
+
+
+def test_change_to_a_later_month_keeps_earlier_results_cached(client, month):
+    client.post('/month/create', json={'year': 2031, 'month': 1, 'expenses': [month['expense']]})
+    assert client.get('/analytics/balance', params={'year': 2030}).json()['data'][0]['balance'] == '90.00'
+    client.get('/analytics/bills/on-time', params={'year': 2030})
+    client.get('/analytics/balance')
+
+    bill_id = client.get('/bill/2031_01').json()['data'][0]['id']
+    client.patch(f'/bill/{bill_id}', json={'amount': 20})
+
+    hits = analytics_cache.hits
+    client.get('/analytics/balance', params={'year': 2030})
+    client.get('/analytics/bills/on-time', params={'year': 2030})
+    assert analytics_cache.hits == hits + 2
+    # The result covering the changed month is computed again
+    assert client.get('/analytics/balance').json()['data'][-1]['running_balance'] == '70.00'
+    assert analytics_cache.hits == hits + 2
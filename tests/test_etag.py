@@ -0,0 +1,25 @@
+from tests.conftest import execute, listener_paused, wait_until
+
+
+def test_cached_month_is_tagged_with_the_version_it_was_read_at(client, sql, month):
+    first = client.get(f"/month/{month['id']}")
+    etag = first.headers['ETag']
+
+    with listener_paused():
+        execute(sql, 'UPDATE income SET amount = 999 WHERE month_id = %s', month['id'])
+        # The change is not notified yet, the cached body may be served but only with its own tag
+        cached = client.get(f"/month/{month['id']}")
+        assert cached.json() == first.json()
+        assert cached.headers['ETag'] == etag
+
+    wait_until(lambda: client.get(f"/month/{month['id']}").json()['data']['total_income'] == '999')
+    changed = client.get(f"/month/{month['id']}", headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_unchanged_month_is_not_modified(client, month):
+    etag = client.get(f"/month/{month['id']}").headers['ETag']
+    response = client.get(f"/month/{month['id']}", headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.content == b''
@@ -0,0 +1,19 @@
+import asyncio
+import json
+
+from src.notifications.feed import Change, ChannelFeed
+from src.schemas.expense_vo import ExpenseVo
+
+
+def test_batch_that_fails_to_resolve_is_published_as_a_resync():
+    async def publish():
+        feed = ChannelFeed('expenses', resolver=None, row_model=ExpenseVo)
+        since = feed.seq
+        # A row the trigger sent that doesn't validate loses the batch
+        await feed.publish({'X': Change('add', {'id': 'X'})})
+        return since, feed.replay(since)
+
+    since, missed = asyncio.run(publish())
+    assert len(missed) == 1
+    frame = json.loads(missed[0][1])
+    assert frame['action'] == 'resync' and frame['seq'] == since + 1
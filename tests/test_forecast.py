@@ -0,0 +1,15 @@
+import numpy as np
+
+from src.schemas.forecast_vo import ForecastGranularity
+from src.services.forecast_service import project
+
+
+def test_due_days_out_of_the_month_are_charged_on_its_first_and_last_days():
+    due_days = np.array([0, -3, 31], dtype=np.int64)
+    until = np.array(['NaT'] * 3, dtype='datetime64[D]')
+    days, credits, debits, balances = project(np.datetime64('2030-02', 'M'), 1, ForecastGranularity.day, due_days,
+                                              np.array([100, 200, 400], dtype=np.int64), np.ones(3, dtype=bool),
+                                              until, 1000, 0)
+    assert len(days) == 28
+    assert debits[0] == 300 and debits[-1] == 400 and debits.sum() == 700
+    assert balances[-1] == 300
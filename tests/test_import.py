@@ -0,0 +1,38 @@
+from tests.conftest import execute
+
+
+def test_import_without_notify_asks_listeners_to_resync(client, month):
+
+    bill_feed, month_feed = client.websocket_connect(f"/bill/ws/{month['id']}"), client.websocket_connect('/month/ws')
+    with bill_feed as bills, month_feed as months:
+        import_csv(client, 'bills', 'month_id,name,amount\n2030_01,water,5\n2030_01,power,7\n')
+        frame = bills.receive_json()
+        assert frame['action'] == 'resync' and 'seq' in frame
+        assert months.receive_json()['data']['id'] == month['id']
+
+    with client.websocket_connect('/expenses/ws') as expenses:
+        import_csv(client, 'expenses', 'name,due_day,amount\nwater,10,5\npower,12,7\n')
+        assert expenses.receive_json()['action'] == 'resync'
+
+
+def import_csv(client, kind: str, body: str):
+    response = client.post(f'/import/{kind}', content=body, headers={'Content-Type': 'text/csv'})
+    assert response.status_code == 200, response.text
+
+
+def test_quoted_field_may_hold_line_breaks(client, sql):
+    import_csv(client, 'expenses', 'name,due_day,amount\r\n"Water\r\nand ""sewer""",10,5\r\npower,12,7\r\n')
+    names = execute(sql, 'SELECT name FROM expenses ORDER BY due_day')
+    assert names == [('Water\nand "sewer"',), ('power',)]
+
+
+def test_errors_point_at_the_first_line_of_the_record(client):
+    response = client.post('/import/expenses', content='name,due_day,amount\n"Water\nand sewer",x,5\n',
+                           headers={'Content-Type': 'text/csv'})
+    assert response.status_code == 400
+    assert response.json()['errors'][0]['detail'].startswith('Line 2: due_day')
+
+    response = client.post('/import/expenses', content='name,due_day,amount\n"Water,10,5\n',
+                           headers={'Content-Type': 'text/csv'})
+    assert response.status_code == 400
+    assert response.json()['errors'][0]['detail'] == 'Line 2: unterminated quoted field'
@@ -0,0 +1,30 @@
+import threading
+
+from tests.conftest import connect, execute, wait_until
+
+WAITING_ON_LOCK = "SELECT count(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock' " \
+                  "AND datname = current_database()"
+
+
+def test_concurrent_writes_to_a_month_keep_its_totals(sql):
+    execute(sql, 'INSERT INTO months (year, month) VALUES (2030, 4)')
+    first, second = connect(), connect()
+    try:
+        execute(first, "INSERT INTO bills (name, month_id, day, amount) VALUES ('rent', '2030_04', 5, 10)")
+
+        def write_second():
+            execute(second, "INSERT INTO bills (name, month_id, day, amount) VALUES ('power', '2030_04', 9, 20)")
+            second.commit()
+
+        writer = threading.Thread(target=write_second)
+        writer.start()
+        # The second refresh waits on the summary row until the first transaction is done
+        wait_until(lambda: execute(sql, WAITING_ON_LOCK)[0][0] == 1)
+        first.commit()
+        writer.join(5)
+    finally:
+        first.close()
+        second.close()
+
+    summary = execute(sql, "SELECT total_expense, last_date FROM month_summary WHERE slug = '2030_04'")
+    assert summary == [(30, 9)]
@@ -0,0 +1,55 @@
+import asyncio
+import base64
+
+import pytest
+
+from src.settings.settings import app_settings
+from tests.conftest import execute
+
+
+@pytest.fixture
+def count_cache(monkeypatch):
+    from src.jsonapi.count_cache import count_cache
+    monkeypatch.setattr(app_settings, 'page_count_cache', True)
+    count_cache.clear()
+    return count_cache
+
+
+def total_count(client, path: str) -> int:
+    return client.get(path).json()['meta']['page']['total_count']
+
+
+def test_counts_are_dropped_when_notifications_may_have_been_lost(client, sql, count_cache):
+    from src.database.subscription import listener
+    client.post('/expenses/', json={'name': 'rent', 'due_day': 5, 'amount': 10})
+    assert total_count(client, '/expenses/') == 1
+
+    # Written without a notification, as if it was sent while the listener was reconnecting
+    execute(sql, "SET financer.notify = 'off'")
+    execute(sql, "INSERT INTO expenses (name, due_day, amount) VALUES ('power', 9, 20)")
+    assert total_count(client, '/expenses/') == 1
+
+    async def reconnected():
+        for callback in listener.reconnect_callbacks:
+            callback()
+
+    asyncio.run_coroutine_threadsafe(reconnected(), listener.loop).result()
+    assert total_count(client, '/expenses/') == 2
+
+
+@pytest.mark.parametrize('month_id', ['2030_01', 'x :y', "x' :y"])
+def test_estimate_takes_values_as_they_are(client, month_id):
+    response = client.get(f'/bill/{month_id}', params={'count': 'estimate'})
+    assert response.status_code == 200
+    assert response.json()['meta']['page']['total_count_estimated'] is True
+
+
+@pytest.mark.parametrize('values', ['[5]', '{"day": 5}'])
+def test_cursor_not_matching_the_order_is_a_user_error(client, values):
+    response = client.get('/bill/2030_01', params={'after': encode(values)})
+    assert response.status_code == 400
+    assert response.json()['errors'][0]['detail'] == 'Invalid page cursor'
+
+
+def encode(cursor: str) -> str:
+    return base64.urlsafe_b64encode(cursor.encode()).decode()
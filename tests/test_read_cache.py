@@ -0,0 +1,35 @@
+from src.services.cache import ReadCache
+from tests.conftest import execute
+
+
+def test_notified_change_is_never_served_stale(client, sql):
+    expense_id = client.post('/expenses/', json={'name': 'rent', 'due_day': 5, 'amount': 10}).json()['data']['id']
+    assert client.get(f'/expenses/{expense_id}').json()['data']['amount'] == '10.00'
+
+    with client.websocket_connect('/expenses/ws') as websocket:
+        execute(sql, 'UPDATE expenses SET amount = 20.00 WHERE id = %s', expense_id)
+        # The cache sees every notification before the feeds, once the frame is out the entry is gone
+        assert websocket.receive_json()['data']['id'] == expense_id
+        assert client.get(f'/expenses/{expense_id}').json()['data']['amount'] == '20.00'
+
+
+def test_bill_changes_reach_the_cached_bill(client, sql, month):
+    bill_id = month['bill']
+    # An empty update answers with the bill lookup, which goes through the cache
+    assert client.patch(f'/bill/{bill_id}', json={}).json()['data']['paid'] is False
+
+    with client.websocket_connect('/month/ws') as websocket:
+        execute(sql, 'UPDATE bills SET paid = true WHERE id = %s', bill_id)
+        assert websocket.receive_json()['data']['id'] == month['id']
+        assert client.patch(f'/bill/{bill_id}', json={}).json()['data']['paid'] is True
+
+
+def test_value_loaded_during_an_invalidation_is_not_stored():
+    cache = ReadCache('test')
+    generation = cache.generation
+    cache.invalidate('key')
+    cache.put('key', 'loaded before the invalidation', generation)
+    # Read through the snapshot, a lookup would start listening for notifications
+    assert cache.snapshot()['entries'] == 0
+    cache.put('key', 'loaded after the invalidation', cache.generation)
+    assert cache.snapshot()['entries'] == 1
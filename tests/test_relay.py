@@ -0,0 +1,70 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+from websockets.sync.client import connect as websocket_connect
+
+from tests.conftest import execute, wait_until
+
+WORKERS = 3
+CLIENTS = 6
+LISTENING = "SELECT count(*) FROM pg_stat_activity WHERE query ILIKE 'LISTEN%%'"
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def server(sql, tmp_path):
+    """
+    The API with several workers, sharing the notifications of one relay
+    """
+    port = free_port()
+    environment = dict(os.environ, NOTIFY_RELAY_SOCKET=str(tmp_path / 'notify.sock'))
+    # A session of its own, so the relay and the workers go down with it
+    process = subprocess.Popen([sys.executable, 'main.py', '--workers', str(WORKERS), '--port', str(port)],
+                               cwd=os.path.dirname(os.path.dirname(__file__)), env=environment,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        wait_until(lambda: responds(f'http://127.0.0.1:{port}/'), timeout=30)
+        yield port
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(10)
+
+
+def responds(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def test_workers_share_one_listen_connection(server, sql):
+    listening = execute(sql, LISTENING)[0][0]
+    clients = [websocket_connect(f'ws://127.0.0.1:{server}/expenses/ws') for _ in range(CLIENTS)]
+    try:
+        wait_until(lambda: execute(sql, LISTENING)[0][0] == listening + 1)
+        # The relay LISTENs once, the workers joining after that only tell it over its socket
+        time.sleep(0.5)
+        request = urllib.request.Request(f'http://127.0.0.1:{server}/expenses/', method='POST',
+                                         data=json.dumps({'name': 'rent', 'due_day': 5, 'amount': 10}).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            expense_id = json.load(response)['data']['id']
+        for client in clients:
+            assert json.loads(client.recv(timeout=5))['data']['id'] == expense_id
+        assert execute(sql, LISTENING)[0][0] == listening + 1
+    finally:
+        for client in clients:
+            client.close()
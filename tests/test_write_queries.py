@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from src.database.db import async_engine
+
+
+@contextmanager
+def counted_statements():
+    statements = []
+
+    def count(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', count)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, 'before_cursor_execute', count)
+
+
+@pytest.mark.parametrize('method, path, body', [
+    ('PATCH', '/expenses/{expense}', {'amount': 12}),
+    ('PATCH', '/bill/{bill}', {'paid': True}),
+    ('PATCH', '/income/{income}', {'amount': 200}),
+    ('DELETE', '/bill/{bill}', None),
+    ('DELETE', '/income/{income}', None),
+    ('DELETE', '/month/{id}', None),
+])
+def test_write_is_a_single_statement(client, month, method, path, body):
+    with counted_statements() as statements:
+        response = client.request(method, path.format(**month), json=body)
+    assert response.status_code in (200, 204)
+    assert len(statements) == 1, statements
+
+
+def test_expense_delete_is_a_single_statement(client, month):
+    client.delete(f"/month/{month['id']}")
+    with counted_statements() as statements:
+        assert client.delete(f"/expenses/{month['expense']}").status_code in (200, 204)
+    assert len(statements) == 1, statements
+
+
+@pytest.mark.parametrize('method, path', [
+    ('PATCH', '/expenses/00000000-0000-0000-0000-000000000000'),
+    ('DELETE', '/bill/00000000-0000-0000-0000-000000000000'),
+    ('DELETE', '/month/1999_01'),
+])
+def test_missing_row_is_not_found(client, sql, method, path):
+    assert client.request(method, path, json={'amount': 1} if method == 'PATCH' else None).status_code == 404